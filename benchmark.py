@@ -0,0 +1,517 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import json
+import argparse
+import random
+import shutil
+import platform
+import statistics
+import subprocess
+import tempfile
+import socket
+import http.client
+from PyQt5.QtGui import QImage, QPainter, QColor, QLinearGradient
+from PyQt5.QtCore import Qt, QByteArray, QBuffer
+import fitz
+try:
+    import resource
+except ImportError:  # Windows, no peak RSS
+    resource = None
+
+import pdf_signer_v2 as signer
+
+def make_document(path, page_count, paper=fitz.paper_size('a4'), kind='text'):
+    # Synthetic text page with a drawing, roughly what a typical form looks like,
+    # or for kind 'image' a page covered by a photo, like a scan (a different JPEG on every page)
+    doc = fitz.open()
+    for page_number in range(page_count):
+        page = doc.new_page(width=paper[0], height=paper[1])
+        if kind == 'image':
+            page.insert_image(page.rect, stream=make_photo(page_number))
+            continue
+        for line in range(int((paper[1] - 100) / 18)):
+            page.insert_text((50, 60 + line * 18), f'Page {page_number + 1}, line {line + 1}: Lorem ipsum dolor sit amet, consectetur adipiscing elit.', fontsize=9)
+        page.draw_rect(fitz.Rect(50, paper[1] - 42, 300, paper[1] - 12), color=(0, 0, 0))
+    doc.save(path)
+    doc.close()
+
+def make_photo(seed, width=1240, height=1754):
+    # JPEG of 150 dpi A4 with gradients and shapes, compresses about like a scanned page
+    rng = random.Random(seed)
+    image = QImage(width, height, QImage.Format_RGB32)
+    painter = QPainter(image)
+    gradient = QLinearGradient(0, 0, width, height)
+    gradient.setColorAt(0, QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    gradient.setColorAt(1, QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    painter.fillRect(image.rect(), gradient)
+    painter.setPen(Qt.NoPen)
+    for shape in range(200):
+        painter.setBrush(QColor(rng.randrange(256), rng.randrange(256), rng.randrange(256), 128))
+        painter.drawEllipse(rng.randrange(width), rng.randrange(height), rng.randrange(20, 300), rng.randrange(20, 300))
+    painter.end()
+    byte_array = QByteArray()
+    buffer = QBuffer(byte_array)
+    buffer.open(QBuffer.WriteOnly)
+    image.save(buffer, 'JPEG', 75)
+    return bytes(byte_array)
+
+def make_signature(path):
+    # Returns the (path, scale factor) entry the compose functions expect
+    image = QImage(600, 200, QImage.Format_ARGB32)
+    image.fill(Qt.transparent)
+    painter = QPainter(image)
+    painter.setPen(QColor(0, 0, 120))
+    for x in range(0, 560, 8):
+        painter.drawLine(20 + x, 100 + (x % 40) - 20, 28 + x, 100 - (x % 40) + 20)
+    painter.end()
+    image.save(path)
+    return path, signer.SIGNATURE_HEIGHT / signer.load_signature_image(path).height()  # trimmed like in the window
+
+def png_handoff(output, page, rect, image, options):
+    # The former path: encode to PNG through QBuffer and let fitz decode and compress it again
+    byte_array = QByteArray()
+    buffer = QBuffer(byte_array)
+    buffer.open(QBuffer.WriteOnly)
+    image.save(buffer, 'PNG')
+    page.insert_image(rect, pixmap=fitz.Pixmap(bytearray(buffer.data().data())))
+
+def raw_handoff(output, page, rect, image, options):
+    # The path of the save job: raw samples compressed once and inserted as a ready image stream
+    signer.insert_encoded_image(output, page, rect, signer.encode_output_image(image, options))
+
+def bench_handoff(workdir, pages):
+    pdf_path = os.path.join(workdir, 'handoff.pdf')
+    signature_path = os.path.join(workdir, 'signature.png')
+    make_document(pdf_path, pages)
+    signature = make_signature(signature_path)
+    doc = fitz.open(pdf_path)
+
+    for gray in (True, False):
+        options = {'saveGray': gray, 'saveSkewed': True, 'seed': 1, 'saveEncoding': 'flate', 'saveFlateLevel': 6}
+        images = [signer.compose_output_image(doc, page_number, [(0, 1.0, 200, 1500)], [signature], options)
+                  for page_number in range(pages)]
+        results = {}
+        for name, handoff in (('png', png_handoff), ('raw', raw_handoff)):
+            output = fitz.open()
+            start = time.perf_counter()
+            for page_number, image in enumerate(images):
+                rect = doc[page_number].rect
+                handoff(output, output.new_page(-1, rect.width, rect.height), rect, image, options)
+            output_path = os.path.join(workdir, f'handoff_{name}.pdf')
+            output.save(output_path, deflate=True)
+            output.close()
+            results[name] = (time.perf_counter() - start) / pages, os.path.getsize(output_path)
+        saved = results['png'][0] - results['raw'][0]
+        print(f"handoff {'gray' if gray else 'color'}: png {results['png'][0] * 1000:.1f} ms/page, "
+              f"raw {results['raw'][0] * 1000:.1f} ms/page, saved {saved * 1000:.1f} ms/page "
+              f"({results['png'][1] // pages} vs {results['raw'][1] // pages} bytes/page)")
+    doc.close()
+
+ENCODER_MODES = [
+    ('flate-1 gray', {'saveEncoding': 'flate', 'saveFlateLevel': 1, 'saveGray': True}),
+    ('flate-6 gray', {'saveEncoding': 'flate', 'saveFlateLevel': 6, 'saveGray': True}),
+    ('flate-9 gray', {'saveEncoding': 'flate', 'saveFlateLevel': 9, 'saveGray': True}),
+    ('flate-6 color', {'saveEncoding': 'flate', 'saveFlateLevel': 6, 'saveGray': False}),
+    ('jpeg-50 gray', {'saveEncoding': 'jpeg', 'saveQuality': 50, 'saveGray': True}),
+    ('jpeg-75 gray', {'saveEncoding': 'jpeg', 'saveQuality': 75, 'saveGray': True}),
+    ('jpeg-75 color', {'saveEncoding': 'jpeg', 'saveQuality': 75, 'saveGray': False}),
+    ('bilevel', {'saveEncoding': 'bilevel', 'saveGray': True}),
+]
+
+def bench_encoders(workdir, pages):
+    # Bytes per page of the signed output for every encoder setting
+    pdf_path = os.path.join(workdir, 'encoders.pdf')
+    signature_path = os.path.join(workdir, 'signature.png')
+    make_document(pdf_path, pages)
+    signature = make_signature(signature_path)
+    doc = fitz.open(pdf_path)
+
+    for name, mode in ENCODER_MODES:
+        options = {'saveSkewed': True, 'seed': 1, 'saveQuality': 75, 'saveFlateLevel': 6}
+        options.update(mode)
+        output = fitz.open()
+        start = time.perf_counter()
+        for page_number in range(pages):
+            encoded, _ = signer.compose_output_page(doc, page_number, [(0, 1.0, 200, 1500)], [signature], options)
+            rect = doc[page_number].rect
+            signer.insert_encoded_image(output, output.new_page(-1, rect.width, rect.height), rect, encoded)
+        output_path = os.path.join(workdir, 'encoders_output.pdf')
+        output.save(output_path, deflate=True)
+        output.close()
+        elapsed = time.perf_counter() - start
+        print(f'encoder {name:14} {os.path.getsize(output_path) // pages:9d} bytes/page {elapsed / pages * 1000:7.1f} ms/page')
+    doc.close()
+
+def bench_scan(workdir, pages):
+    # Scan simulation of the QPainter and the NumPy engine, compared on the same composed pages
+    pdf_path = os.path.join(workdir, 'scan.pdf')
+    signature_path = os.path.join(workdir, 'signature.png')
+    make_document(pdf_path, pages)
+    signature = make_signature(signature_path)
+    doc = fitz.open(pdf_path)
+
+    for gray in (True, False):
+        for skewed, effects in ((False, False), (True, False), (True, True)):
+            options = {'saveGray': gray, 'saveSkewed': skewed, 'saveScanEffects': effects, 'seed': 1}
+            results = {}
+            for engine in ('qpainter', 'numpy'):
+                if engine == 'numpy' and signer.numpy is None or engine == 'qpainter' and effects:
+                    continue  # the scan effects exist only in the NumPy engine
+                options['scanEngine'] = engine
+                start = time.perf_counter()
+                for page_number in range(pages):
+                    signer.compose_output_image(doc, page_number, [(0, 1.0, 200, 1500)], [signature], options)
+                results[engine] = (time.perf_counter() - start) / pages * 1000
+            name = f"{'gray' if gray else 'color'}{' skewed' if skewed else ''}{' effects' if effects else ''}"
+            print(f'scan {name:20} ' + ', '.join(f'{engine} {ms:6.1f} ms/page' for engine, ms in results.items()))
+    doc.close()
+
+# Seconds from launching the process, medians over the runs. A regression if any is exceeded.
+STARTUP_TARGETS = {'import': 0.6, 'first paint': 1.0, 'page paint': 2.5}
+
+# Runs in a fresh interpreter, in the order of pdf_signer_v2's own __main__: import, QApplication, window.
+# Records when the window is painted first and when page 1 is painted, then quits.
+STARTUP_CHILD = r"""
+import sys, os, time, json
+marks = {'start': time.time()}
+sys.path.insert(0, sys.argv[1])
+import pdf_signer_v2 as signer
+marks['import'] = time.time()
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QObject, QEvent
+app = QApplication(sys.argv[:1])
+windows = []
+class PaintProbe(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and windows:
+            marks.setdefault('first paint', time.time())
+            pixmap = windows[0].pdf_label.pixmap()
+            if obj is windows[0].pdf_label and pixmap is not None and not pixmap.isNull():
+                marks.setdefault('page paint', time.time())
+        return False
+probe = PaintProbe()
+app.installEventFilter(probe)
+windows.append(signer.PDFSigner(sys.argv[2]))
+while 'page paint' not in marks and time.time() - marks['start'] < 30:
+    app.processEvents()
+    time.sleep(0.001)
+app.aboutToQuit.emit()
+with open(sys.argv[3], 'w') as file:
+    json.dump(marks, file)
+os._exit(0)
+"""
+
+def bench_startup(workdir, runs):
+    # Import time and time to first paint of the window and of page 1, with its own settings and caches
+    # (the first run fills the disk caches like the first start on a new machine)
+    pdf_path = os.path.join(workdir, 'startup.pdf')
+    make_document(pdf_path, 20)
+    environment = dict(os.environ, HOME=os.path.join(workdir, 'home'), XDG_CACHE_HOME=os.path.join(workdir, 'cache'),
+                       QT_QPA_PLATFORM=os.environ.get('QT_QPA_PLATFORM', 'offscreen'))
+    times = {name: [] for name in STARTUP_TARGETS}
+    for run in range(runs):
+        marks_path = os.path.join(workdir, 'startup.json')
+        launched = time.time()
+        # Output to a file, the worker processes may keep a pipe open after the window has quit
+        with open(os.path.join(workdir, 'startup.log'), 'w') as log:
+            subprocess.run([sys.executable, '-c', STARTUP_CHILD, os.path.dirname(os.path.abspath(signer.__file__)), pdf_path, marks_path],
+                           env=environment, stdout=log, stderr=log, timeout=60, check=True)
+        with open(marks_path, 'r') as file:
+            marks = json.load(file)
+        for name in STARTUP_TARGETS:
+            times[name].append(marks[name] - launched if name in marks else float('inf'))
+    regressions = 0
+    for name, target in STARTUP_TARGETS.items():
+        median = statistics.median(times[name])
+        regressions += median > target
+        print(f'startup {name:12} {median * 1000:7.0f} ms median of {runs} (min {min(times[name]) * 1000:.0f} ms), '
+              f"target {target * 1000:.0f} ms{'' if median <= target else ' EXCEEDED'}")
+    return regressions
+
+def bench_service(workdir, runs, page_count):
+    # Latency and throughput of signing single documents: a CLI process per PDF against the --serve service,
+    # through a --service client process per PDF and as plain requests from this process
+    pdf_path = os.path.join(workdir, 'form.pdf')
+    make_document(pdf_path, page_count)
+    signature_path, _ = make_signature(os.path.join(workdir, 'signature.png'))
+    placements = {'signatures': [signature_path], 'pages': [[[0, 1.0, 200, 1500]]]}
+    placements_path = os.path.join(workdir, 'placements.json')
+    with open(placements_path, 'w') as file:
+        json.dump(placements, file)
+    copies_dir = os.path.join(workdir, 'copies')
+    os.makedirs(copies_dir)
+    copies = [shutil.copy(pdf_path, os.path.join(copies_dir, f'form{number}.pdf')) for number in range(4 * runs)]
+    environment = dict(os.environ, HOME=os.path.join(workdir, 'home'), XDG_CACHE_HOME=os.path.join(workdir, 'cache'),
+                       QT_QPA_PLATFORM=os.environ.get('QT_QPA_PLATFORM', 'offscreen'))
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    script = [sys.executable, os.path.abspath(signer.__file__), '--batch', placements_path,
+              '--output-dir', os.path.join(workdir, 'signed'), '--overwrite']
+    client = script + ['--service', '--port', str(port)]
+
+    def run(command):
+        start_time = time.perf_counter()
+        subprocess.run(command, env=environment, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=300, check=True)
+        return time.perf_counter() - start_time
+
+    latencies, throughputs = {}, {}
+    latencies['cold CLI'] = [run(script + [pdf_path]) for _ in range(runs)]
+    throughputs['cold CLI, all PDFs at once'] = len(copies) / run(script + copies)
+
+    # Output to a file, the worker processes may keep a pipe open after the service has stopped
+    with open(os.path.join(workdir, 'service.log'), 'w') as log:
+        start_time = time.perf_counter()
+        server = subprocess.Popen(script + ['--serve', '--port', str(port)], env=environment, stdout=log, stderr=log)
+    try:
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', port)).close()
+                break
+            except ConnectionRefusedError:
+                if server.poll() is not None or time.perf_counter() - start_time > 60:
+                    raise RuntimeError(f"service did not start, see {os.path.join(workdir, 'service.log')}")
+                time.sleep(0.05)
+        startup = time.perf_counter() - start_time
+
+        latencies['service, client process'] = [run(client + [pdf_path]) for _ in range(runs)]
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=300)
+        with open(pdf_path, 'rb') as file:
+            data = json.dumps({'pages': placements['pages'], 'name': 'form.pdf'}).encode() + b'\n' + file.read()
+        latencies['service, request'] = []
+        for _ in range(runs):
+            start_time = time.perf_counter()
+            connection.request('POST', '/sign', data)
+            response = connection.getresponse()
+            response.read()
+            latencies['service, request'].append(time.perf_counter() - start_time)
+            if response.status != 200:
+                raise RuntimeError(f'service answered {response.status}')
+        connection.close()
+        throughputs['service, all PDFs at once'] = len(copies) / run(client + ['--workers', '4'] + copies)
+    finally:
+        server.terminate()
+        server.wait(60)
+
+    print(f'service startup {startup * 1000:.0f} ms, {page_count} page documents, {runs} runs')
+    for name, times in latencies.items():
+        times = sorted(times)
+        print(f'{name:28} latency median {statistics.median(times) * 1000:6.0f} ms, '
+              f'p95 {times[min(len(times) - 1, int(len(times) * 0.95))] * 1000:6.0f} ms, {len(times) / sum(times):5.2f} documents/s one after another')
+    for name, throughput in throughputs.items():
+        print(f'{name:28} {throughput:5.2f} documents/s for {len(copies)} documents')
+    return latencies, throughputs
+
+# name: (kind, pages, paper), from a single form up to a long report and poster sized pages
+SUITE_CASES = {
+    'text-a4-1': ('text', 1, 'a4'),
+    'text-a4-100': ('text', 100, 'a4'),
+    'text-a4-1000': ('text', 1000, 'a4'),
+    'image-a4-50': ('image', 50, 'a4'),
+    'text-a0-10': ('text', 10, 'a0'),
+    'image-a0-10': ('image', 10, 'a0'),
+}
+SUITE_ZOOMS = (1, 2, 4)  # assemble_pixmap zoom levels
+SUITE_SWITCHES = 20  # page switches timed per case
+SUITE_CURSORS = 20  # signature cursor updates timed per zoom level
+
+def pump(app, until, timeout=300):
+    # Process events until the condition holds, False on timeout
+    deadline = time.perf_counter() + timeout
+    while not until():
+        if time.perf_counter() > deadline:
+            return False
+        app.processEvents()
+        time.sleep(0.001)
+    return True
+
+def peak_rss_mb():
+    # Of this process and, separately, of the largest waited-for worker process
+    if resource is None:
+        return None, None
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024  # ru_maxrss is in bytes on macOS, in KiB elsewhere
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1024 / 1024,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale / 1024 / 1024)
+
+def run_case(pdf_path, signature_path, save_pages):
+    # One case in this process, which is fresh, so the peak RSS is that of this case.
+    # Runs the window like a user would: open, page through, zoom, move a signature around and save.
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication(sys.argv[:1])
+    signatures_list_file = signer.config_file('signatures')
+    os.makedirs(os.path.dirname(signatures_list_file), exist_ok=True)
+    with open(signatures_list_file, 'w') as file:
+        file.write(signature_path + '\n')
+    window = signer.PDFSigner()
+    window.show()
+    pump(app, lambda: not window.open_after_paint)
+    results = {}
+
+    def timed(function, *args):
+        start = time.perf_counter()
+        function(*args)
+        return (time.perf_counter() - start) * 1000
+
+    # Opening: until page 1 is shown, and until all page sizes are known (and saving is possible)
+    window.pdf_path = pdf_path
+    start = time.perf_counter()
+    window.load_pdf_document()
+    pump(app, lambda: window.pdf_label.pixmap() is not None and not window.pdf_label.pixmap().isNull())
+    results['load first page ms'] = (time.perf_counter() - start) * 1000
+    pump(app, lambda: window.total_pages and len(window.pages) == window.total_pages)
+    results['load all pages ms'] = (time.perf_counter() - start) * 1000
+    pump(app, lambda: not window.render_pool.futures and not window.index_pool.futures)
+
+    # Page switching, with the pauses between keystrokes that let the prefetch catch up
+    switches = []
+    for step in range(min(SUITE_SWITCHES, window.total_pages - 1)):
+        switches.append(timed(window.next_page))
+        pump(app, lambda: not window.render_pool.futures)
+    if switches:
+        results['page switch median ms'] = statistics.median(switches)
+        results['page switch max ms'] = max(switches)
+
+    # The displayed page with a signature, rendered at each zoom level (not cached yet) and again (cached)
+    window.pages[window.current_page][1].append((0, 1.0, 100, 100))
+    for zoom in SUITE_ZOOMS:
+        window.page_cache.clear()
+        window.disk_cache.clear()
+        results[f'assemble zoom {zoom} ms'] = timed(window.assemble_pixmap, window.current_page, zoom)
+        results[f'assemble zoom {zoom} cached ms'] = timed(window.assemble_pixmap, window.current_page, zoom)
+
+    # The signature cursor follows every zoom step of the mouse wheel, the first of a size is scaled from the pyramid
+    window.toggle_signature(force_activate=True)
+    for zoom in SUITE_ZOOMS:
+        window.display_zoom_factor = zoom
+        cursors = [timed(window.draw_signature_cursor) for step in range(SUITE_CURSORS)]
+        results[f'cursor zoom {zoom} first ms'] = cursors[0]
+        results[f'cursor zoom {zoom} median ms'] = statistics.median(cursors[1:])
+    window.display_zoom_factor = 1.0
+
+    # Saving with the settings of a new installation, per page
+    if window.total_pages <= save_pages:
+        window.settings['skewSeed'] = 1
+        start = time.perf_counter()
+        window.save_pdf(skip=True)
+        pump(app, lambda: window.save_job is None)
+        results['save per page ms'] = (time.perf_counter() - start) * 1000 / window.total_pages
+        results['save bytes per page'] = os.path.getsize(signer.signed_pdf_path(pdf_path, window.language)) // window.total_pages
+
+        # Again with the invisible text layer
+        os.remove(signer.signed_pdf_path(pdf_path, window.language))
+        window.settings['saveText'] = True
+        start = time.perf_counter()
+        window.save_pdf(skip=True)
+        pump(app, lambda: window.save_job is None)
+        results['save with text per page ms'] = (time.perf_counter() - start) * 1000 / window.total_pages
+        results['save with text bytes per page'] = os.path.getsize(signer.signed_pdf_path(pdf_path, window.language)) // window.total_pages
+        window.settings['saveText'] = False
+
+        # The same in overlay mode, with a signature on every page (drawn from the one shared image)
+        os.remove(signer.signed_pdf_path(pdf_path, window.language))
+        for page in window.pages:
+            page[1][:] = [(0, 1.0, 100, 100)]
+        window.settings['saveMode'] = 'overlay'
+        start = time.perf_counter()
+        window.save_pdf(skip=True)
+        pump(app, lambda: window.save_job is None)
+        results['overlay save per page ms'] = (time.perf_counter() - start) * 1000 / window.total_pages
+        results['overlay bytes per page'] = os.path.getsize(signer.signed_pdf_path(pdf_path, window.language)) // window.total_pages
+
+    # Wait for the workers to exit, their peak RSS only counts once they are
+    for pool in (window.open_pool, window.render_pool, window.index_pool, window.save_pool, window.save_writer_pool):
+        if pool is not None and pool.executor is not None:
+            pool.executor.shutdown(wait=True, cancel_futures=True)
+            pool.executor = None
+    results['peak rss mb'], results['peak worker rss mb'] = peak_rss_mb()
+    return results
+
+def bench_suite(workdir, names, save_pages):
+    # Every case in its own process, with its own settings and caches, returns {case: {metric: value}}
+    signature_path = os.path.join(workdir, 'signature.png')
+    make_signature(signature_path)
+    environment = dict(os.environ, HOME=os.path.join(workdir, 'home'), XDG_CACHE_HOME=os.path.join(workdir, 'cache'),
+                       QT_QPA_PLATFORM=os.environ.get('QT_QPA_PLATFORM', 'offscreen'))
+    results = {}
+    for name in names:
+        kind, pages, paper = SUITE_CASES[name]
+        pdf_path = os.path.join(workdir, f'{name}.pdf')
+        make_document(pdf_path, pages, fitz.paper_size(paper), kind)
+        result_path = os.path.join(workdir, f'{name}.json')
+        with open(os.path.join(workdir, f'{name}.log'), 'w') as log:
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--run-case', pdf_path, signature_path, result_path,
+                            '--save-pages', str(save_pages)], env=environment, stdout=log, stderr=log, timeout=3600, check=True)
+        with open(result_path, 'r') as file:
+            results[name] = json.load(file)
+        results[name]['file bytes'] = os.path.getsize(pdf_path)
+        for metric, value in results[name].items():
+            print(f'{name:14} {metric:26} {value:12.2f}' if value is not None else f'{name:14} {metric:26} {"-":>12}')
+    shutil.rmtree(environment['HOME'], ignore_errors=True)
+    shutil.rmtree(environment['XDG_CACHE_HOME'], ignore_errors=True)
+    return results
+
+def suite_machine():
+    return {'python': platform.python_version(), 'system': platform.platform(), 'cpus': os.cpu_count(),
+            'pymupdf': fitz.VersionBind, 'numpy': signer.numpy is not None}
+
+def compare_results(old, new, threshold):
+    # Prints the metrics of both runs, returns how many got worse by more than threshold percent
+    # and by at least 1 ms, byte or MB, below that it is timer noise (all metrics are lower is better)
+    if old.get('machine') != new.get('machine'):
+        print(f"note: measured on a different machine or setup\n  old {old.get('machine')}\n  new {new.get('machine')}")
+    regressions = 0
+    for name, metrics in new['cases'].items():
+        for metric, value in metrics.items():
+            before = old['cases'].get(name, {}).get(metric)
+            if before is None or value is None:
+                continue
+            change = (value - before) / before * 100 if before else 0.0
+            worse = change > threshold and value - before >= 1
+            regressions += worse
+            print(f"{name:14} {metric:26} {before:12.2f} {value:12.2f} {change:+7.1f} %{' WORSE' if worse else ''}")
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='PDF Signer benchmarks')
+    parser.add_argument('--pages', type=int, default=5, help='pages of the synthetic documents')
+    parser.add_argument('--startup', type=int, metavar='RUNS', nargs='?', const=5,
+                        help='only measure the startup, exit status 1 if it misses STARTUP_TARGETS (default 5 runs)')
+    parser.add_argument('--service', type=int, metavar='RUNS', nargs='?', const=10,
+                        help='only compare signing through the --serve service with a CLI process per PDF (default 10 runs)')
+    parser.add_argument('--suite', nargs='*', metavar='CASE', choices=list(SUITE_CASES),
+                        help=f"run the window on synthetic documents instead, all cases or the given ones: {', '.join(SUITE_CASES)}")
+    parser.add_argument('--save-pages', type=int, default=100, help='--suite saves documents up to this many pages (default 100)')
+    parser.add_argument('--output', help='write the --suite results to this JSON file')
+    parser.add_argument('--compare', metavar='JSON', help='compare the --suite results with an earlier --output, exit status 1 on regressions')
+    parser.add_argument('--threshold', type=float, default=10, help='percentage a metric may get worse in --compare (default 10)')
+    parser.add_argument('--run-case', nargs=3, metavar=('PDF', 'SIGNATURE', 'RESULT'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        pdf_path, signature_path, result_path = args.run_case
+        results = run_case(pdf_path, signature_path, args.save_pages)
+        with open(result_path, 'w') as file:
+            json.dump(results, file)
+        os._exit(0)  # the window is not closed, which would ask to save the placed signature
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.suite is not None:
+            results = {'machine': suite_machine(), 'cases': bench_suite(workdir, args.suite or list(SUITE_CASES), args.save_pages)}
+            if args.output:
+                with open(args.output, 'w') as file:
+                    json.dump(results, file, indent=1)
+            if args.compare:
+                with open(args.compare, 'r') as file:
+                    sys.exit(1 if compare_results(json.load(file), results, args.threshold) else 0)
+            sys.exit(0)
+        if args.service:
+            bench_service(workdir, args.service, args.pages)
+            sys.exit(0)
+        if args.startup:
+            sys.exit(1 if bench_startup(workdir, args.startup) else 0)
+        bench_handoff(workdir, args.pages)
+        bench_encoders(workdir, args.pages)
+        bench_scan(workdir, args.pages)
+        bench_startup(workdir, 5)
@@ -2,15 +2,221 @@
 import sys
 import os
 import random
-from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QLabel, QPushButton, QToolButton, QFileDialog, QScrollArea, QWidget, QSizePolicy, QMessageBox, QComboBox, QToolBar, QAction, QDialog, QCheckBox, QTableWidget, QTableWidgetItem, QStyle
-from PyQt5.QtGui import QPixmap, QImage, QImageReader, QPainter, QCursor, QIcon
-from PyQt5.QtCore import Qt, QByteArray, QBuffer, QRectF, QSize, pyqtSignal
-import fitz
+import math
+from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QLabel, QPushButton, QToolButton, QFileDialog, QScrollArea, QWidget, QSizePolicy, QMessageBox, QComboBox, QToolBar, QAction, QDialog, QCheckBox, QTableWidget, QTableWidgetItem, QStyle, QSpinBox, QHBoxLayout, QProgressDialog, QListView, QDockWidget, QTabBar
+from PyQt5.QtGui import QPixmap, QImage, QImageReader, QPainter, QCursor, QIcon, QColor, QFont
+from PyQt5.QtCore import Qt, QRect, QRectF, QPoint, QSize, QObject, QTimer, QEventLoop, pyqtSignal, QAbstractListModel, QModelIndex, QByteArray, QBuffer
+import importlib
+import importlib.util
 import platform
 import locale
 import subprocess
 import copy
 import time
+import zlib
+import tempfile
+import argparse
+import glob
+import json
+import hashlib
+import mmap
+import struct
+import threading
+import contextlib
+import shutil
+import select
+import signal
+from collections import OrderedDict, deque
+
+class LazyModule:
+    # Imports the module on first use. MuPDF, NumPy and the process pools take longer to import than
+    # the whole window takes to appear, and many runs (or worker processes) never need some of them.
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def __getattr__(self, attribute):
+        if self._module is None:
+            self.__dict__['_module'] = importlib.import_module(self._name)
+        return getattr(self._module, attribute)
+
+fitz = LazyModule('fitz')
+futures = LazyModule('concurrent.futures')
+multiprocessing = LazyModule('multiprocessing')
+ctypes = LazyModule('ctypes')
+http_server = LazyModule('http.server')
+http_client = LazyModule('http.client')
+# Scan simulation falls back to QPainter, without the scan effects, if NumPy is missing
+numpy = LazyModule('numpy') if importlib.util.find_spec('numpy') is not None else None
+
+RENDER_DPI = 150  # resolution of the page rasters, placements are stored in this pixel space
+TILE_SIZE = 256  # edge length in display pixels of the tiles rendered when zoomed in
+SIGNATURE_HEIGHT = 20  # height in page raster pixels of a signature placed at zoom 1
+TEXT_FONT = 'FText'  # resource name of the font of the invisible text layer (saveText)
+THUMBNAIL_WIDTH = 120  # display pixels, page thumbnails are fitted into THUMBNAIL_WIDTH x 1.5 * THUMBNAIL_WIDTH
+# inotify(7), for --watch
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_TO = 0x80
+IN_Q_OVERFLOW = 0x4000
+INOTIFY_EVENT = struct.Struct('iIII')  # wd, mask, cookie, length of the name that follows
+SERVICE_PORT = 8765  # localhost port of --serve and --service
+SERVICE_OPTIONS = ('saveMode', 'saveText', 'saveGray', 'saveSkewed', 'saveScanEffects', 'scanEngine', 'saveEncoding', 'saveQuality', 'saveFlateLevel', 'skewSeed')
+DEBUG = bool(os.environ.get('PDFSIGNER_DEBUG'))  # print render statistics to stderr
+
+class Tracer:
+    # Spans around the slow phases (opening, rasterizing, compositing, scan simulation, encoding, writing), enabled with
+    # PDFSIGNER_TRACE=trace.json or --trace. The worker processes inherit the variable and every process appends its spans
+    # as JSON lines to a file of its own. finish() merges them into a Chrome trace for chrome://tracing or ui.perfetto.dev
+    # and prints the totals per phase. Disabled, span() returns the same do-nothing context manager every time.
+    NO_SPAN = contextlib.nullcontext()
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def span(self, name, **args):
+        if self.path is None:
+            return self.NO_SPAN
+        return TraceSpan(self, name, args)
+
+    def now(self):
+        # Start of a span that ends in another event handler, see record()
+        return time.perf_counter_ns() if self.path is not None else None
+
+    def record(self, name, start, args=None):
+        # Monotonic clock, the same in all processes of the machine
+        if self.path is None or start is None:
+            return
+        event = {'name': name, 'ph': 'X', 'ts': start / 1000, 'dur': (time.perf_counter_ns() - start) / 1000,
+                 'pid': os.getpid(), 'tid': threading.get_native_id()}
+        if args:
+            event['args'] = args
+        if self.file is None:
+            self.file = open(f'{self.path}.{os.getpid()}.part', 'a', buffering=1)  # line buffered, workers are stopped without notice
+        self.file.write(json.dumps(event) + '\n')
+
+    def finish(self):
+        if self.path is None:
+            return
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        events = []
+        for part_path in glob.glob(glob.escape(self.path) + '.*.part'):
+            with open(part_path, 'r') as file:
+                for line in file:
+                    try:
+                        events.append(json.loads(line))
+                    except ValueError:
+                        pass  # cut off by a worker that was stopped
+            os.remove(part_path)
+        with open(self.path, 'w') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
+        print(trace_summary(events), file=sys.stderr)
+        print(f'Trace written to {self.path}', file=sys.stderr)
+
+class TraceSpan:
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exception):
+        self.tracer.record(self.name, self.start, self.args)
+
+def trace_summary(events):
+    # Table of count, total, mean and maximum per span name, largest total first. Nested spans are counted
+    # in their parents as well, e.g. encode in compose page.
+    phases = {}
+    for event in events:
+        phases.setdefault(event['name'], []).append(event['dur'] / 1000)
+    lines = [f"{'phase':24} {'count':>7} {'total ms':>11} {'mean ms':>9} {'max ms':>9}"]
+    for name, durations in sorted(phases.items(), key=lambda phase: -sum(phase[1])):
+        lines.append(f'{name:24} {len(durations):7d} {sum(durations):11.1f} {sum(durations) / len(durations):9.2f} {max(durations):9.2f}')
+    return '\n'.join(lines)
+
+tracer = Tracer(os.environ.get('PDFSIGNER_TRACE') or None)
+
+def config_file(name, language='en'):
+    # Path of a file in the per-user configuration directory
+    if platform.system() == 'Windows':
+        return os.path.expandvars(f'%APPDATA%\\pdfsigner\\{name}.ini')
+    elif platform.system() == 'Linux':
+        return os.path.expanduser(f'~/.config/pdfsigner/{name}.conf')
+    elif platform.system() == 'Darwin':  # MacOS
+        return os.path.expanduser(f'~/Library/Application Support/pdfsigner/{name}.conf')
+    else:
+        raise NotImplementedError('Betriebssystem nicht unterstützt' if language == 'de' else 'Unsupported operating system')
+
+def cache_dir(name, language='en'):
+    # Per-user directory for data that can be thrown away at any time
+    if platform.system() == 'Windows':
+        return os.path.expandvars(f'%LOCALAPPDATA%\\pdfsigner\\{name}')
+    elif platform.system() == 'Linux':
+        return os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'pdfsigner', name)
+    elif platform.system() == 'Darwin':  # MacOS
+        return os.path.expanduser(f'~/Library/Caches/pdfsigner/{name}')
+    else:
+        raise NotImplementedError('Betriebssystem nicht unterstützt' if language == 'de' else 'Unsupported operating system')
+
+def file_content_hash(path):
+    digest = hashlib.sha256()
+    with tracer.span('hash file'), open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def read_settings(settings_info, config_path):
+    default_settings = {key: info['value'] for key, info in settings_info.items()}
+
+    settings = default_settings.copy()
+
+    try:
+        with open(config_path, 'r') as file:
+            for line in file:
+                key, value = line.strip().split('=')
+                if key in default_settings:
+                    if isinstance(default_settings[key], bool):
+                        settings[key] = value.lower() == 'true'
+                    elif 'choices' in settings_info[key]:
+                        if value in settings_info[key]['choices']:
+                            settings[key] = value
+                    else:
+                        try:
+                            settings[key] = type(default_settings[key])(value)
+                        except ValueError:
+                            pass
+    except FileNotFoundError:
+        pass
+
+    return settings
+
+def read_signature_list(signatures_list_file):
+    # Signature image paths, in the order of the signature indices
+    try:
+        with open(signatures_list_file, 'r') as file:
+            return [line.strip() for line in file]
+    except Exception as e:
+        return []
+
+def system_language(settings):
+    # (two letter system locale, language of the texts)
+    system_locale = (locale.getdefaultlocale()[0] or 'en')[:2]
+    return system_locale, 'de' if system_locale == 'de' and not settings['forceEnglish'] else 'en'
+
+def output_options(settings, random_seed=None):
+    # random_seed: used instead of a new one if no skew seed is set, so repeated saves of a document look the same
+    options = {key: settings[key] for key in ('saveMode', 'saveText', 'saveGray', 'saveSkewed', 'saveScanEffects', 'scanEngine', 'saveEncoding', 'saveQuality', 'saveFlateLevel')}
+    options['seed'] = settings['skewSeed'] or random_seed or random.randrange(1, 2**31)
+    options['fixedSeed'] = bool(settings['skewSeed'])
+    return options
+
+def signed_pdf_path(pdf_path, language, number=''):
+    return os.path.splitext(pdf_path)[0] + ('_signiert' if language == 'de' else '_signed') + f'{number}' + '.pdf'
 
 class CustomToolBar(QToolBar):
     def contextMenuEvent(self, event):
@@ -31,6 +237,15 @@ class MouseDetectingQLabel(QLabel):
 
     def __init__(self, parent=None):
         super(MouseDetectingQLabel, self).__init__(parent)
+        self.tile_painter = None  # paints only the exposed area instead of a pixmap if set
+
+    def paintEvent(self, event):
+        if self.tile_painter is None:
+            super().paintEvent(event)
+        else:
+            painter = QPainter(self)
+            self.tile_painter(painter, event.rect())
+            painter.end()
 
     def enterEvent(self, event):
         self.mouseEntered.emit()
@@ -38,6 +253,53 @@ class MouseDetectingQLabel(QLabel):
     def leaveEvent(self, event):
         self.mouseLeft.emit()
 
+class ThumbnailModel(QAbstractListModel):
+    # One row per page whose size is known. The view only asks for the rows it paints, so thumbnail(page_number)
+    # is only called for visible pages. It returns None and has the thumbnail rendered if it is not there yet,
+    # page_changed() then shows it. signature_count(page_number) marks the pages that already have placements.
+    def __init__(self, thumbnail, signature_count, language):
+        super().__init__()
+        self.thumbnail = thumbnail
+        self.signature_count = signature_count
+        self.language = language
+        self.page_count = 0
+        self.placeholder = QPixmap(THUMBNAIL_WIDTH, int(THUMBNAIL_WIDTH * 1.5))
+        self.placeholder.fill(Qt.transparent)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.page_count
+
+    def data(self, index, role=Qt.DisplayRole):
+        page_number = index.row()
+        if role == Qt.DisplayRole:
+            count = self.signature_count(page_number)
+            return f'{page_number + 1}' + (f'  ✍ {count}' if count else '')
+        elif role == Qt.DecorationRole:
+            return self.thumbnail(page_number) or self.placeholder
+        elif role == Qt.FontRole and self.signature_count(page_number):
+            font = QFont()
+            font.setBold(True)
+            return font
+        elif role == Qt.ToolTipRole:
+            count = self.signature_count(page_number)
+            return (f'Seite {page_number + 1}, {count} Signatur(en)' if self.language == 'de' else f'Page {page_number + 1}, {count} signature(s)')
+        return None
+
+    def set_page_count(self, page_count):
+        # Pages are only added while a document opens, a new document starts from 0
+        if page_count > self.page_count:
+            self.beginInsertRows(QModelIndex(), self.page_count, page_count - 1)
+            self.page_count = page_count
+            self.endInsertRows()
+        elif page_count < self.page_count:
+            self.beginResetModel()
+            self.page_count = page_count
+            self.endResetModel()
+
+    def page_changed(self, page_number):
+        if 0 <= page_number < self.page_count:
+            self.dataChanged.emit(self.index(page_number), self.index(page_number))
+
 class ToggleableSplitComboBox(QComboBox):
     def __init__(self):
         super().__init__()
@@ -55,10 +317,1836 @@ class ToggleableSplitComboBox(QComboBox):
                 # Clicked on the arrow or elsewhere
                 super().mousePressEvent(event)
 
+def render_page_raster(page, width, height):
+    # Render a fitz page from its vector source to exactly width x height pixels
+    with tracer.span('rasterize', page=page.number, width=width, height=height):
+        pixmap = page.get_pixmap(matrix=fitz.Matrix(width / page.rect.width, height / page.rect.height))
+        return pixmap.width, pixmap.height, pixmap.stride, pixmap.samples
+
+def render_tile_raster(display_list, page_rect, width, height, tile_rect):
+    # Render only tile_rect (in display pixels) of a page shown at width x height
+    matrix = fitz.Matrix(width / page_rect.width, height / page_rect.height)
+    clip = fitz.Rect(tile_rect.left(), tile_rect.top(), tile_rect.right() + 1, tile_rect.bottom() + 1) * ~matrix
+    with tracer.span('rasterize tile'):
+        pixmap = display_list.get_pixmap(matrix=matrix, clip=clip)
+    return pixmap.width, pixmap.height, pixmap.stride, pixmap.samples
+
+def raster_to_pixmap(raster):
+    width, height, stride, samples = raster
+    return QPixmap.fromImage(QImage(samples, width, height, stride, QImage.Format_RGB888))
+
+_worker_documents = OrderedDict()  # documents opened by the current render process, most recently used last
+
+def worker_document(path):
+    # MuPDF documents must not be shared between threads, so every render process opens its own copy.
+    # Keyed by modification time and size too, so a file replaced under the same name is opened again.
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    doc = _worker_documents.pop(key, None)
+    if doc is None:
+        with tracer.span('open document'):
+            doc = fitz.open(path)
+    _worker_documents[key] = doc
+    while len(_worker_documents) > 4:
+        _worker_documents.popitem(last=False)[1].close()
+    return doc
+
+def render_page_job(path, page_number, width, height):
+    return render_page_raster(worker_document(path).load_page(page_number), width, height)
+
+OPEN_CHUNK_PAGES = 64  # page sizes are read in chunks while a document opens, the first chunk comes with the page count
+
+def open_document_job(path):
+    doc = worker_document(path)
+    return doc.page_count, page_raster_sizes_job(path, 0, OPEN_CHUNK_PAGES)
+
+def page_raster_sizes_job(path, start, end):
+    doc = worker_document(path)
+    with tracer.span('page sizes', start=start):
+        return [page_raster_size(doc[page_number]) for page_number in range(start, min(end, doc.page_count))]
+
+def page_raster_size(page):
+    # Size of the page raster at RENDER_DPI, the pixel space of the signature placements
+    page_rect = (page.rect * fitz.Matrix(RENDER_DPI / 72.0, RENDER_DPI / 72.0)).irect
+    return page_rect.width, page_rect.height
+
+_worker_signatures = {}  # signature images loaded by the current process
+
+def load_signature_image(path):
+    image = _worker_signatures.get(path)
+    if image is None:
+        image = trim_signature(read_signature_image(path))
+        _worker_signatures[path] = image
+    return image
+
+def read_signature_image(path):
+    # Load the image with QImageReader to enable automatic alpha channel handling
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    image = reader.read()
+    if image.isNull():
+        raise IOError(f'{path}: {reader.errorString()}')
+    return image
+
+def trim_signature(image):
+    # Cut off fully transparent margins, so placements and sizes refer to the ink. Only QImage,
+    # the save processes trim in exactly the same way as the window.
+    if not image.hasAlphaChannel():
+        return image
+    alpha = image.convertToFormat(QImage.Format_Alpha8)
+    width, height = alpha.width(), alpha.height()
+    samples, blank = image_rows(alpha, width), bytes(width)
+    top = bottom = left = right = None
+    for y, row in enumerate(samples[i:i + width] for i in range(0, width * height, width)):
+        if row == blank:
+            continue
+        if top is None:
+            top = y
+        bottom = y
+        row_left, row_right = width - len(row.lstrip(b'\0')), len(row.rstrip(b'\0'))
+        left = row_left if left is None else min(left, row_left)
+        right = row_right if right is None else max(right, row_right)
+    if top is None:
+        return image  # nothing visible at all, keep it as it is
+    return image.copy(left, top, right - left, bottom - top + 1)
+
+def scan_parameters(options, page_numbers):
+    # Scan simulation of a batch of pages, seeded per page, so the result does not depend on which process renders which page
+    parameters = []
+    for page_number in page_numbers:
+        rng = random.Random(f"{options['seed']}-{page_number}")
+        angle = rng.uniform(0.1, 0.5)  # drawn first, the angle is the same with and without the effects
+        page_parameters = {'angle': angle if options['saveSkewed'] else 0.0, 'scale': 1.0, 'offset': (0.0, 0.0),
+                           'contrast': 1.0, 'gamma': 1.0, 'speckles': 0, 'paper': None, 'noise_seed': 0}
+        if options.get('saveScanEffects') and numpy is not None:
+            page_parameters.update({'scale': rng.uniform(0.994, 1.0),  # feeders pull the paper slightly
+                                    'offset': (rng.uniform(-4, 4), rng.uniform(-4, 4)),
+                                    'contrast': rng.uniform(1.05, 1.2), 'gamma': rng.uniform(0.85, 1.0),
+                                    'speckles': rng.randint(20, 60),  # dust specks per megapixel
+                                    'paper': tuple(rng.uniform(244, 252) - tint for tint in (0, 2, 6)),
+                                    'noise_seed': rng.randrange(2**32)})
+        parameters.append(page_parameters)
+    return parameters
+
+def compose_output_image(doc, page_number, placements, signatures, options):
+    # Page raster with signatures and scan simulation, as RGB888 or Grayscale8 image.
+    # Only uses QImage, so it runs in save processes without a QApplication.
+    page = doc.load_page(page_number)
+    width, height, stride, samples = render_page_raster(page, *page_raster_size(page))
+    parameters = scan_parameters(options, [page_number])[0]
+    numpy_engine = options.get('scanEngine') == 'numpy' and numpy is not None
+    # QPainter rotates fastest on RGB32, the NumPy engine works on the packed samples directly
+    image = QImage(samples, width, height, stride, QImage.Format_RGB888)
+    image = image.copy() if numpy_engine else image.convertToFormat(QImage.Format_RGB32)
+
+    # Load the signatures before painting, a painter still active on an error takes the process down
+    with tracer.span('composite', signatures=len(placements)):
+        signature_images = [load_signature_image(signatures[sig_idx][0]) for sig_idx, sig_zoom, x, y in placements]
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.Antialiasing)
+        for signature_image, (sig_idx, sig_zoom, x, y) in zip(signature_images, placements):
+            scale_factor = signatures[sig_idx][1] * sig_zoom
+            painter.drawImage(int(x), int(y), signature_image.scaled(int(signature_image.width() * scale_factor),
+                                                                      int(signature_image.height() * scale_factor),
+                                                                      aspectRatioMode=Qt.KeepAspectRatio,
+                                                                      transformMode=Qt.SmoothTransformation))
+        painter.end()
+
+        if options['saveGray']:
+            image = image.convertToFormat(QImage.Format_Grayscale8)
+
+    if numpy_engine and (parameters['angle'] or parameters['scale'] != 1.0 or parameters['paper'] is not None):
+        with tracer.span('scan simulation'):
+            channels = 1 if options['saveGray'] else 3
+            pixels = simulate_scan(image_array(image, channels), channels, parameters)
+            return QImage(pixels.data, width, height, pixels.strides[0],
+                          QImage.Format_Grayscale8 if options['saveGray'] else QImage.Format_RGB888).copy()
+
+    if parameters['angle'] and not numpy_engine:
+        with tracer.span('rotate'):
+            # Create a blank QImage with the same size as image
+            rotated_image = QImage(image.size(), QImage.Format_RGB32)
+            rotated_image.fill(Qt.white)
+
+            # Perform the rotation using a QPainter
+            painter = QPainter(rotated_image)
+            painter.setRenderHint(QPainter.Antialiasing, False)  # Set anti-aliasing to False
+            painter.setRenderHint(QPainter.SmoothPixmapTransform, True)
+            painter.translate(image.width() / 2, image.height() / 2)
+            painter.rotate(parameters['angle'])
+            target_rect = QRectF(-image.width() / 2, -image.height() / 2, image.width(), image.height())
+            painter.drawImage(target_rect, image)
+            painter.end()
+            image = rotated_image
+
+    return image.convertToFormat(QImage.Format_Grayscale8 if options['saveGray'] else QImage.Format_RGB888)
+
+def image_array(image, channels):
+    # (height, width * channels) uint8 view of a Grayscale8 or RGB888 image without the line padding, valid while image lives
+    bits = image.constBits()
+    bits.setsize(image.bytesPerLine() * image.height())
+    return numpy.frombuffer(bits, numpy.uint8).reshape(image.height(), image.bytesPerLine())[:, :image.width() * channels]
+
+def ink_runs(mask, gap=32):
+    # (start, end) of the runs of True in a 1D bool array. Runs less than gap apart are joined,
+    # interpolating a few blank lines costs less than another round of slicing.
+    edges = numpy.flatnonzero(numpy.diff(mask.astype(numpy.int8), prepend=0, append=0)).tolist()
+    runs = []
+    for start, end in zip(edges[::2], edges[1::2]):
+        if runs and start - runs[-1][1] < gap:
+            runs[-1] = (runs[-1][0], end)
+        else:
+            runs.append((start, end))
+    return runs
+
+def blend_into(out, first, second, weight):
+    # out = first * (256 - weight) / 256 + second * weight / 256, weight as uint16 in 0..256
+    value = first.astype(numpy.uint16)
+    value *= 256 - weight
+    value += second * weight
+    value >>= 8
+    out[...] = value
+
+def shear_rows(pixels, out, shifts, channels, runs):
+    # Moves row y of pixels right by shifts[y] pixels into out, for the rows in runs, with linear interpolation.
+    # The few pixels uncovered at the left and right edge keep what out holds.
+    row_bytes = pixels.shape[1]
+    steps = numpy.floor(shifts).astype(numpy.int64)
+    weights = numpy.round((shifts - steps) * 256).astype(numpy.uint16)
+    for start, end in runs:
+        cuts = [start] + (numpy.flatnonzero(numpy.diff(steps[start:end])) + 1 + start).tolist() + [end]
+        for first_row, last_row in zip(cuts[:-1], cuts[1:]):
+            # out x lies between pixels x - step - 1 and x - step
+            step = int(steps[first_row]) + 1
+            low, high = max(step, 0) * channels, row_bytes + min(step - 1, 0) * channels
+            blend_into(out[first_row:last_row, low:high],
+                       pixels[first_row:last_row, low - (step - 1) * channels:high - (step - 1) * channels],
+                       pixels[first_row:last_row, low - step * channels:high - step * channels],
+                       weights[first_row:last_row, None])
+
+def shear_columns(pixels, out, shifts, channels, runs):
+    # Moves pixel column x down by shifts[x] pixels into out, only near the rows in runs
+    height = pixels.shape[0]
+    steps = numpy.floor(shifts).astype(numpy.int64)
+    weights = numpy.repeat(numpy.round((shifts - steps) * 256).astype(numpy.uint16), channels)
+    cuts = [0] + (numpy.flatnonzero(numpy.diff(steps)) + 1).tolist() + [len(steps)]
+    for first_column, last_column in zip(cuts[:-1], cuts[1:]):
+        step = int(steps[first_column]) + 1
+        columns = slice(first_column * channels, last_column * channels)
+        weight = weights[columns][None, :]
+        for start, end in runs:
+            low, high = max(start + step - 1, step, 0), min(end + step, height + step - 1, height)
+            if low < high:
+                blend_into(out[low:high, columns], pixels[low - step + 1:high - step + 1, columns], pixels[low - step:high - step, columns], weight)
+
+def scale_pixels(pixels, channels, scale):
+    # Nearest neighbour scaling around the centre, enough for a fraction of a percent: a few evenly spread
+    # lines are dropped or doubled, so the rest is copied in blocks instead of gathered pixel by pixel
+    height, row_bytes = pixels.shape
+    width = row_bytes // channels
+    out = numpy.empty_like(pixels)
+    row_blocks, column_blocks = scale_blocks(height, scale), scale_blocks(width, scale)
+    for out_rows, rows in row_blocks:
+        for (first_out, last_out), (first, last) in column_blocks:
+            out[out_rows[0]:out_rows[1], first_out * channels:last_out * channels] = \
+                pixels[rows[0]:rows[1], first * channels:last * channels]
+    return out
+
+def scale_blocks(length, scale):
+    # ((out start, out end), (source start, source end)) of the runs of consecutive source lines
+    source = numpy.clip((numpy.arange(length) / scale + length * (1 - 1 / scale) / 2).astype(numpy.int64), 0, length - 1)
+    cuts = [0] + (numpy.flatnonzero(numpy.diff(source) != 1) + 1).tolist() + [length]
+    return [((first, last), (int(source[first]), int(source[first]) + last - first)) for first, last in zip(cuts[:-1], cuts[1:])]
+
+def simulate_scan(pixels, channels, parameters, paper_white=255):
+    # Scanned look of a (height, width * channels) uint8 page in one pass over its ink: small rotation
+    # with scale and offset jitter, contrast and gamma, dust specks and paper tone. Returns a new array.
+    # The rotation is split into a horizontal and a vertical shear, exact enough below a degree. Blank lines
+    # stay blank in both shears, so only lines with ink are interpolated, the rest is filled with paper.
+    height, row_bytes = pixels.shape
+    width = row_bytes // channels
+    if parameters['scale'] != 1.0:
+        pixels = scale_pixels(pixels, channels, parameters['scale'])
+
+    sine = numpy.sin(numpy.radians(parameters['angle']))
+    offset_x, offset_y = parameters['offset']
+    runs = ink_runs(pixels.min(axis=1) < paper_white)
+    if sine or offset_x or offset_y:
+        sheared = numpy.full(pixels.shape, paper_white, numpy.uint8)
+        shear_rows(pixels, sheared, offset_x - sine * (numpy.arange(height) - height / 2), channels, runs)
+        pixels = numpy.full(pixels.shape, paper_white, numpy.uint8)
+        shear_columns(sheared, pixels, offset_y + sine * (numpy.arange(width) - width / 2), channels, runs)
+        runs = ink_runs(pixels.min(axis=1) < paper_white)
+    else:
+        pixels = pixels.copy()
+
+    if parameters['contrast'] != 1.0 or parameters['gamma'] != 1.0 or parameters['paper'] is not None:
+        # One lookup table per channel: contrast around the middle, gamma, then white becomes the paper tone.
+        # Blank rows are just filled with the paper tone.
+        levels = numpy.clip((numpy.arange(256) / 255 - 0.5) * parameters['contrast'] + 0.5, 0, 1) ** parameters['gamma']
+        paper = parameters['paper'] or (255,) * 3
+        tones = [paper[1]] if channels == 1 else paper
+        tables = [numpy.round(levels * tone).astype(numpy.uint8) for tone in tones]
+        blank = numpy.ones(height, bool)
+        for start, end in runs:
+            blank[start:end] = False
+            for channel, table in enumerate(tables):
+                samples = pixels[start:end, channel::channels]
+                samples[...] = numpy.take(table, samples)
+        pixels[blank] = numpy.tile(numpy.array([table[paper_white] for table in tables], numpy.uint8), width)
+
+    if parameters['speckles']:
+        rng = numpy.random.default_rng(parameters['noise_seed'])
+        count = parameters['speckles'] * width * height // 1000000
+        ys, xs = rng.integers(0, height, count), rng.integers(0, width, count)
+        shades = rng.integers(0, 96, count).astype(numpy.uint8)
+        for channel in range(channels):
+            pixels[ys, xs * channels + channel] = shades
+    return pixels
+
+def image_rows(image, row_bytes):
+    # Image data without the padding QImage adds to every line to align it to 32 bit
+    bytes_per_line, height = image.bytesPerLine(), image.height()
+    bits = image.constBits()
+    bits.setsize(bytes_per_line * height)
+    samples = bits.asstring()
+    if bytes_per_line != row_bytes:
+        samples = b''.join(samples[y * bytes_per_line:y * bytes_per_line + row_bytes] for y in range(height))
+    return samples
+
+def image_samples(image):
+    # Tightly packed samples of an RGB888 or Grayscale8 image
+    components = 1 if image.format() == QImage.Format_Grayscale8 else 3
+    return components, image.width(), image.height(), image_rows(image, image.width() * components)
+
+def bilevel_rows(image):
+    # 1 bit per pixel, packed MSB first, 1 is white
+    mono = image.convertToFormat(QImage.Format_Mono, Qt.ThresholdDither)
+    if QColor(mono.color(1)).lightness() < QColor(mono.color(0)).lightness():
+        mono.invertPixels()
+    return image_rows(mono, (mono.width() + 7) // 8)
+
+def compress_fax_g4(rows, width, height):
+    # MuPDF's CCITT group 4 encoder is only reachable through the low level bindings of recent PyMuPDF versions
+    # (or None if they are missing or fail), the caller falls back to Flate then
+    try:
+        from pymupdf import mupdf
+        buffer = mupdf.fz_compress_ccitt_fax_g4(mupdf.python_buffer_data(rows), width, height, (width + 7) // 8)
+        return mupdf.fz_buffer_extract(buffer)
+    except (ImportError, AttributeError, RuntimeError):
+        return None
+
+def encode_output_image(image, options):
+    with tracer.span('encode', encoding=options['saveEncoding']):
+        return encode_image(image, options)
+
+def encode_image(image, options):
+    # Image XObject for a page: (width, height, components, bits per component, filter, decode parameters, data)
+    width, height = image.width(), image.height()
+    if options['saveEncoding'] == 'bilevel':
+        rows = bilevel_rows(image)
+        data = compress_fax_g4(rows, width, height)
+        if data is not None:
+            return width, height, 1, 1, 'CCITTFaxDecode', f'<</K -1/Columns {width}/Rows {height}>>', data
+        return width, height, 1, 1, 'FlateDecode', None, zlib.compress(rows, options['saveFlateLevel'])
+    raster = image_samples(image)
+    components = raster[0]
+    if options['saveEncoding'] == 'jpeg':
+        return width, height, components, 8, 'DCTDecode', None, samples_to_fitz_pixmap(raster).tobytes('jpg', jpg_quality=options['saveQuality'])
+    return width, height, components, 8, 'FlateDecode', None, zlib.compress(raster[3], options['saveFlateLevel'])
+
+def insert_encoded_image(doc, page, rect, encoded):
+    # Add the already encoded image stream as it is, so MuPDF neither decodes nor compresses it again
+    width, height, components, bits, image_filter, decode_parms, data = encoded
+    xref = doc.get_new_xref()
+    doc.update_object(xref, f"<</Type/XObject/Subtype/Image/Width {width}/Height {height}"
+                            f"/ColorSpace/{'DeviceGray' if components == 1 else 'DeviceRGB'}/BitsPerComponent {bits}>>")
+    doc.update_stream(xref, data, compress=False)
+    doc.xref_set_key(xref, 'Filter', f'/{image_filter}')
+    if decode_parms:
+        doc.xref_set_key(xref, 'DecodeParms', decode_parms)
+    page.insert_image(rect, xref=xref)
+    return xref
+
+def samples_to_fitz_pixmap(raster):
+    components, width, height, samples = raster
+    return fitz.Pixmap(fitz.csGRAY if components == 1 else fitz.csRGB, width, height, samples, False)
+
+def compose_output_page(doc, page_number, placements, signatures, options):
+    # signatures: [(path, scale factor)], as in PDFSigner.signatures
+    # Returns the encoded image and, with saveText, the text layer of the page (None without or if there is no text)
+    with tracer.span('compose page', page=page_number):
+        encoded = encode_output_image(compose_output_image(doc, page_number, placements, signatures, options), options)
+        if not options.get('saveText'):
+            return encoded, None
+        with tracer.span('text layer'):
+            return encoded, text_layer(doc.load_page(page_number), options)
+
+def scan_matrix(parameters, numpy_engine, width, height):
+    # Where compose_output_image moves a pixel of the width x height page raster, as a fitz.Matrix: the NumPy
+    # engine scales around the centre and rotates by a horizontal and a vertical shear, QPainter rotates
+    centre = fitz.Matrix(1, 0, 0, 1, -width / 2, -height / 2)
+    if numpy_engine and (parameters['angle'] or parameters['scale'] != 1.0 or parameters['paper'] is not None):
+        sine, scale = math.sin(math.radians(parameters['angle'])), parameters['scale']
+        offset_x, offset_y = parameters['offset']
+        moved = fitz.Matrix(scale, scale * sine, -scale * sine, scale * (1 - sine * sine), offset_x, offset_y + sine * offset_x)
+    elif parameters['angle'] and not numpy_engine:
+        moved = fitz.Matrix(parameters['angle'])
+    else:
+        return fitz.Identity
+    return centre * moved * ~centre
+
+_text_widths = None  # advance widths of the WinAnsi codes in Helvetica at size 1, loaded by the first text_layer
+
+def text_widths():
+    # Looking up each character with fitz.Font.text_length would take longer than the rest of the text layer
+    global _text_widths
+    if _text_widths is None:
+        font = fitz.Font('helv')
+        _text_widths = [font.glyph_advance(ord(bytes([code]).decode('cp1252', 'replace'))) for code in range(256)]
+    return _text_widths
+
+def text_layer(page, options):
+    # Content stream with the text of the source page in render mode 3 (invisible), span by span, each stretched
+    # to its width on the page and moved like the scan simulation moves the image, so that search hits and
+    # selections lie on the words of the image. Helvetica in WinAnsi encoding, other characters become '?'.
+    widths = text_widths()
+    spans = []
+    for block in page.get_text('dict', flags=fitz.TEXT_PRESERVE_WHITESPACE | fitz.TEXT_MEDIABOX_CLIP)['blocks']:
+        for line in block['lines']:
+            dx, dy = line['dir']
+            for span in line['spans']:
+                text = span['text'].rstrip()
+                if not text or not span['size']:
+                    continue
+                # Width along the writing direction, from the origin to the far end of the span
+                ox, oy = span['origin']
+                x0, y0, x1, y1 = span['bbox']
+                width = max((x - ox) * dx + (y - oy) * dy for x in (x0, x1) for y in (y0, y1))
+                encoded = text.encode('cp1252', 'replace')
+                natural = sum(widths[code] for code in encoded) * span['size']
+                stretch = width / natural * 100 if natural > 0 and width > 0 else 100
+                encoded = encoded.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)').replace(b'\r', b'\\r')
+                # Text space to page space (y down): x along dir, y upwards
+                spans.append(b'/%s %.2f Tf %.1f Tz %.4f %.4f %.4f %.4f %.2f %.2f Tm (%s) Tj' % (
+                    TEXT_FONT.encode(), span['size'], stretch, dx, dy, dy, -dx, ox, oy, encoded))
+    if not spans:
+        return None
+    # Page space of the source (unrotated, points, y down) to the output page (rotated, y up), through the scan simulation
+    parameters = scan_parameters(options, [page.number])[0]
+    numpy_engine = options.get('scanEngine') == 'numpy' and numpy is not None
+    width, height = page_raster_size(page)
+    scale_x, scale_y = page.rect.width / width, page.rect.height / height
+    matrix = (page.rotation_matrix * fitz.Matrix(1 / scale_x, 1 / scale_y) * scan_matrix(parameters, numpy_engine, width, height)
+              * fitz.Matrix(scale_x, 0, 0, -scale_y, 0, page.rect.height))
+    return b'q %.6f %.6f %.6f %.6f %.4f %.4f cm BT 3 Tr\n%s\nET Q\n' % (*tuple(matrix), b'\n'.join(spans))
+
+def insert_text_layer(doc, page, text):
+    # Adds the content stream of text_layer to a new page, before (under) the image
+    xref = doc.get_new_xref()
+    doc.update_object(xref, '<<>>')
+    doc.update_stream(xref, text)
+    doc.xref_set_key(page.xref, 'Contents', f'{xref} 0 R')
+    doc.xref_set_key(page.xref, 'Resources', f'<</Font<</{TEXT_FONT}<</Type/Font/Subtype/Type1/BaseFont/Helvetica/Encoding/WinAnsiEncoding>>>>>>')
+
+def compose_output_page_job(path, page_number, placements, signatures, options):
+    return compose_output_page(worker_document(path), page_number, placements, signatures, options)
+
+def write_output_batch_job(temp_path, page_sizes, encoded_pages, first, fixed_seed):
+    write_output_batch(temp_path, page_sizes, encoded_pages, first, fixed_seed)
+    return len(encoded_pages)
+
+def write_output_batch(temp_path, page_sizes, encoded_pages, first, fixed_seed):
+    # Append a batch of encoded pages to the output file, so finished pages do not pile up in memory
+    doc = fitz.open() if first else fitz.open(temp_path)
+    try:
+        with tracer.span('insert pages', pages=len(encoded_pages)):
+            for (width, height), (encoded, text) in zip(page_sizes, encoded_pages):
+                rect = fitz.Rect(0, 0, width, height)
+                page = doc.new_page(-1, width, height)
+                if text is not None:
+                    insert_text_layer(doc, page, text)
+                insert_encoded_image(doc, page, rect, encoded)
+        # With a fixed seed the output is reproducible, so leave out the random file identifier
+        with tracer.span('pdf save', incremental=not first):
+            if first:
+                doc.save(temp_path, deflate=True, no_new_id=fixed_seed)
+            else:
+                doc.save(temp_path, deflate=True, no_new_id=fixed_seed, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+    finally:
+        doc.close()
+
+def signature_png(image):
+    byte_array = QByteArray()
+    buffer = QBuffer(byte_array)
+    buffer.open(QBuffer.WriteOnly)
+    image.save(buffer, 'PNG')
+    return bytes(byte_array)
+
+def write_overlay(doc, temp_path, pages, signatures, options):
+    # saveMode 'overlay': the original pages stay as they are (vector graphics, searchable text), the signatures are
+    # put on top as images. Each signature image is stored once and shown by its xref on every page using it.
+    xrefs = {}  # signature path -> image xref
+    with tracer.span('overlay signatures'):
+        for page_number, placements in enumerate(pages[:doc.page_count]):
+            if not placements:
+                continue
+            page = doc[page_number]
+            # Placements are pixels of the page raster as shown, insert_image takes points of the unrotated page
+            width, height = page_raster_size(page)
+            to_page = fitz.Matrix(page.rect.width / width, page.rect.height / height) * page.derotation_matrix
+            for sig_idx, sig_zoom, x, y in placements:
+                signature_path, signature_scale = signatures[sig_idx]
+                image = load_signature_image(signature_path)
+                scale_factor = signature_scale * sig_zoom
+                rect = fitz.Rect(x, y, x + int(image.width() * scale_factor), y + int(image.height() * scale_factor)) * to_page
+                if signature_path in xrefs:
+                    page.insert_image(rect, xref=xrefs[signature_path], rotate=page.rotation)
+                else:
+                    xrefs[signature_path] = page.insert_image(rect, stream=signature_png(image), rotate=page.rotation)
+    with tracer.span('pdf save', incremental=False):
+        doc.save(temp_path, garbage=1, deflate=True, no_new_id=options['fixedSeed'])
+
+def write_overlay_job(path, temp_path, pages, signatures, options):
+    doc = fitz.open(path)
+    try:
+        write_overlay(doc, temp_path, pages, signatures, options)
+        return doc.page_count
+    finally:
+        doc.close()
+
+def output_page_keys(path, placements, signatures, options):
+    # Content address of every output page: the source file (by path, modification time and size, as the
+    # save processes open it), the page number, its placements, the signature files and every option the
+    # page image depends on. fixedSeed only changes the file identifier, not the pages.
+    def file_identity(file_path):
+        try:
+            stat = os.stat(file_path)
+            return [os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size]
+        except OSError:
+            return [file_path, None, None]
+    common = json.dumps([file_identity(path), [file_identity(signature_path) + [scale_factor] for signature_path, scale_factor in signatures],
+                         sorted((key, value) for key, value in options.items() if key != 'fixedSeed')])
+    return [hashlib.sha256(json.dumps([common, page_number, page_placements]).encode()).hexdigest()
+            for page_number, page_placements in enumerate(placements)]
+
+ANCHOR_PHRASES = ['unterschrift', 'signature', 'signatur', 'sign here', 'gezeichnet']  # lower case, the last word may continue
+ANCHOR_LINE_WORDS = 8  # longer lines are running text that merely mentions a phrase, not a signature label
+
+class DocumentIndex:
+    # Signature anchors of a document, built once in a background process and sent back whole.
+    # Positions are (x0, y0, x1, y1) in page raster pixels at RENDER_DPI, like the placements.
+    def __init__(self, page_count):
+        self.anchors = [[] for page_number in range(page_count)]  # per page: [(phrase, rect, 'right' or 'above')]
+        self.fields = [[] for page_number in range(page_count)]  # per page: [(field name, rect, 'field')] of signature form fields
+        self.by_phrase = {}  # phrase or lower case field name -> [page numbers], for lookups without scanning pages
+
+    def add(self, entries, page_number, name, rect, side):
+        entries[page_number].append((name, rect, side))
+        pages = self.by_phrase.setdefault(name.lower(), [])
+        if not pages or pages[-1] != page_number:
+            pages.append(page_number)
+
+    def pages_with(self, phrase):
+        return self.by_phrase.get(phrase.lower(), [])
+
+    def targets(self):
+        # Pages with somewhere to sign, form fields take precedence over the anchor texts of the same page
+        for page_number in range(len(self.anchors)):
+            if self.fields[page_number] or self.anchors[page_number]:
+                yield page_number, self.fields[page_number] or self.anchors[page_number]
+
+def raster_rect(rect):
+    scale = RENDER_DPI / 72
+    return rect.x0 * scale, rect.y0 * scale, rect.x1 * scale, rect.y1 * scale
+
+def index_document(doc, phrases=ANCHOR_PHRASES):
+    # One word extraction per page, the label lines are matched against all phrases at once
+    index = DocumentIndex(doc.page_count)
+    phrase_words = [phrase.split() for phrase in phrases]
+    for page in doc:
+        for widget in page.widgets() or []:
+            name = widget.field_name or ''
+            if widget.field_type == fitz.PDF_WIDGET_TYPE_SIGNATURE or any(phrase in name.lower() for phrase in ('sign', 'unterschrift')):
+                index.add(index.fields, page.number, name, raster_rect(widget.rect), 'field')
+
+        lines = OrderedDict()
+        for x0, y0, x1, y1, word, block, line, _ in page.get_text('words'):
+            lines.setdefault((block, line), []).append((word.lower().strip('.,:;()/_-'), fitz.Rect(x0, y0, x1, y1)))
+        for words in lines.values():
+            if len(words) <= ANCHOR_LINE_WORDS:
+                match = find_phrase(words, phrases, phrase_words)
+                if match is not None:
+                    index.add(index.anchors, page.number, *match)
+    return index
+
+def find_phrase(words, phrases, phrase_words):
+    # First phrase in a line of (word, rect), as (phrase, raster rect, side). A phrase followed only by
+    # a blank line to write on is signed right of it ("Signature: ____"), otherwise above the label line.
+    for phrase, parts in zip(phrases, phrase_words):
+        for start in range(len(words) - len(parts) + 1):
+            matched = words[start:start + len(parts)]
+            if all(word == part for (word, _), part in zip(matched[:-1], parts[:-1])) and matched[-1][0].startswith(parts[-1]):
+                if all(not word for word, _ in words[start + len(parts):]):
+                    return phrase, raster_rect(fitz.Rect(matched[0][1]) | matched[-1][1]), 'right'
+                return phrase, raster_rect(fitz.Rect(words[0][1]) | words[-1][1]), 'above'
+    return None
+
+def index_document_job(path):
+    doc = worker_document(path)
+    with tracer.span('index document'):
+        return index_document(doc)
+
+def propose_placements(index, sig_idx, signature_aspect):
+    # Placements (sig_idx, zoom, x, y) by page number: inside a signature field, scaled to fit it,
+    # otherwise right of the anchor text on its line or standing on top of the label, about three text lines high
+    proposals = {}
+    for page_number, entries in index.targets():
+        for name, (x0, y0, x1, y1), side in entries:
+            if side == 'field':
+                zoom = min((y1 - y0) / SIGNATURE_HEIGHT, (x1 - x0) / (SIGNATURE_HEIGHT * signature_aspect))
+                x, y = x0, y1 - SIGNATURE_HEIGHT * zoom
+            elif side == 'right':
+                zoom = 3 * (y1 - y0) / SIGNATURE_HEIGHT
+                x, y = x1 + (y1 - y0) / 2, y1 - SIGNATURE_HEIGHT * zoom
+            else:
+                zoom = 3 * (y1 - y0) / SIGNATURE_HEIGHT
+                x, y = x0, y0 - SIGNATURE_HEIGHT * zoom
+            proposals.setdefault(page_number, []).append((sig_idx, round(zoom, 2), int(x), int(y)))
+    return proposals
+
+def sign_document(path, output_path, pages, signatures, options, batch_pages, auto_place=None):
+    # Signs a whole document without a window, pages: [[(sig_idx, zoom, x, y)]] like PDFSigner.pages[i][1].
+    # Written through a temporary file like SaveJob, so output_path is either complete or untouched.
+    # auto_place: signature index to add at the proposals of index_document, or None
+    doc = fitz.open(path)
+    try:
+        if doc.page_count == 0:
+            raise ValueError('document has no pages')
+        if auto_place is not None:
+            pages = [list(pages[page_number]) if page_number < len(pages) else [] for page_number in range(doc.page_count)]
+            size = load_signature_image(signatures[auto_place][0]).size()
+            for page_number, placements in propose_placements(index_document(doc), auto_place, size.width() / size.height()).items():
+                pages[page_number].extend(placements)
+        page_sizes = [(page.rect.width, page.rect.height) for page in doc]
+        # Hidden, so that whoever collects the output (or --watch, when writing into its own inbox) ignores it
+        handle, temp_path = tempfile.mkstemp(prefix='.', suffix='.pdf.part', dir=os.path.dirname(os.path.abspath(output_path)))
+        os.close(handle)
+        try:
+            if options.get('saveMode') == 'overlay':
+                write_overlay(doc, temp_path, pages, signatures, options)
+            else:
+                for first_page in range(0, doc.page_count, batch_pages):
+                    page_numbers = range(first_page, min(first_page + batch_pages, doc.page_count))
+                    encoded_pages = [compose_output_page(doc, page_number, pages[page_number] if page_number < len(pages) else [], signatures, options)
+                                     for page_number in page_numbers]
+                    write_output_batch(temp_path, page_sizes[first_page:page_numbers.stop], encoded_pages, first_page == 0, options['fixedSeed'])
+            os.replace(temp_path, output_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return doc.page_count
+    finally:
+        doc.close()
+
+def sign_document_job(path, output_path, pages, signatures, options, batch_pages, auto_place):
+    start_time = time.perf_counter()
+    with tracer.span('sign document', path=path):
+        page_count = sign_document(path, output_path, pages, signatures, options, batch_pages, auto_place)
+    return page_count, time.perf_counter() - start_time
+
+def read_placements(placements_path, signature_paths):
+    # Placement file: {"signatures": [image paths], "pages": [[[sig_idx, zoom, x, y], ...], ...]}, or only the pages list.
+    # Coordinates are pixels of the page raster at RENDER_DPI, signature indices refer to signatures.conf by default.
+    # Without a placements_path only the signatures are loaded, for placing them automatically.
+    placements = {'pages': []}
+    if placements_path:
+        with open(placements_path, 'r') as file:
+            placements = json.load(file)
+    if isinstance(placements, list):
+        placements = {'pages': placements}
+    signature_paths = placements.get('signatures', signature_paths)
+    pages = placement_pages(placements['pages'], len(signature_paths))
+    signatures = [(signature_path, SIGNATURE_HEIGHT / load_signature_image(signature_path).height()) for signature_path in signature_paths]
+    return pages, signatures
+
+def placement_pages(pages, signature_count):
+    pages = [[(int(sig_idx), float(zoom), int(x), int(y)) for sig_idx, zoom, x, y in page] for page in pages]
+    for page in pages:
+        for sig_idx, zoom, x, y in page:
+            if not 0 <= sig_idx < signature_count:
+                raise ValueError(f'signature index {sig_idx} out of range, {signature_count} signatures known')
+    return pages
+
+def run_now(function, *args):
+    # Runs function in this process and wraps the outcome like ProcessPoolExecutor.submit
+    future = futures.Future()
+    try:
+        future.set_result(function(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+def read_profile(arguments):
+    # Settings, language and placements shared by --batch and --watch, None if they cannot be used
+    settings = read_settings(PDFSigner.load_settings_info(), config_file('config'))
+    _, language = system_language(settings)
+    try:
+        pages, signatures = read_placements(arguments.batch, read_signature_list(config_file('signatures')))
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f'{arguments.batch or config_file("signatures")}: {e}', file=sys.stderr)
+        return None
+    if arguments.auto_place is not None and not 0 <= arguments.auto_place < len(signatures):
+        print(f'--auto-place: signature index {arguments.auto_place} out of range, {len(signatures)} signatures known', file=sys.stderr)
+        return None
+    return settings, language, pages, signatures
+
+def batch_outputs(arguments, language):
+    # The PDFs given on the command line, {pdf path: output path} of those to sign and the number refused
+    pdf_paths = []
+    for pattern in arguments.pdf:
+        # Windows shells do not expand wildcards
+        pdf_paths.extend(sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern])
+    if not pdf_paths:
+        print('No PDF files given' if language == 'en' else 'Keine PDF-Dateien angegeben', file=sys.stderr)
+
+    jobs = {}
+    failures = 0
+    for pdf_path in pdf_paths:
+        output_path = signed_pdf_path(pdf_path, language)
+        if arguments.output_dir:
+            output_path = os.path.join(arguments.output_dir, os.path.basename(output_path))
+        if os.path.exists(output_path) and not arguments.overwrite:
+            print(f'{pdf_path}: {output_path} exists, use --overwrite', file=sys.stderr)
+            failures += 1
+        else:
+            jobs[pdf_path] = output_path
+    if arguments.output_dir:
+        os.makedirs(arguments.output_dir, exist_ok=True)
+    return pdf_paths, jobs, failures
+
+def batch_sign(arguments):
+    # Headless mode: signs every given PDF with the same placements, one document per process
+    profile = read_profile(arguments)
+    if profile is None:
+        return 2
+    settings, language, pages, signatures = profile
+
+    pdf_paths, jobs, failures = batch_outputs(arguments, language)
+    if not pdf_paths:
+        return 2
+
+    workers = min(arguments.workers or settings['saveWorkers'] or os.cpu_count() or 1, max(1, len(jobs)))
+    executor = futures.ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) if workers > 1 else None
+    start_time = time.perf_counter()
+    signed = total_pages = 0
+    try:
+        # A random seed per document unless skewSeed is fixed, like saving each one in the window
+        futures = {pdf_path: (executor.submit if executor else run_now)(sign_document_job, pdf_path, output_path, pages, signatures,
+                                                                      output_options(settings), settings['savePagesInFlight'],
+                                                                      arguments.auto_place)
+                   for pdf_path, output_path in jobs.items()}
+        for pdf_path, future in futures.items():
+            try:
+                page_count, seconds = future.result()
+            except Exception as e:
+                print(f'{pdf_path}: {e}', file=sys.stderr)
+                failures += 1
+                continue
+            signed += 1
+            total_pages += page_count
+            print(f'{pdf_path} -> {jobs[pdf_path]}: {page_count} pages in {seconds:.2f} s ({seconds / page_count * 1000:.0f} ms/page)')
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+    elapsed = time.perf_counter() - start_time
+    print(f'{signed} of {len(pdf_paths)} documents, {total_pages} pages in {elapsed:.2f} s with {workers} processes: '
+          f'{signed / elapsed:.2f} documents/s, {total_pages / elapsed:.1f} pages/s')
+    return 1 if failures else 0
+
+class InboxWatcher:
+    # Reports the PDFs arriving in a directory: through inotify on Linux, otherwise (or with --poll, e.g. on network
+    # shares, where inotify misses files written by other machines) by listing the directory every poll_interval.
+    # A file has arrived when it was closed after writing or moved in, or when polling, once its size and time
+    # stayed the same for one interval. Hidden files are ignored, senders can write to those and rename them.
+    def __init__(self, directory, poll_interval=None):
+        self.directory = directory
+        self.poll_interval = poll_interval or 2.0
+        self.inotify = None
+        self.backlog = []  # PDFs present before the watch started
+        self.seen = {}  # polling: path -> (size, mtime) at the last listing
+        self.next_scan = 0
+        if poll_interval is None and sys.platform.startswith('linux'):
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd >= 0 and libc.inotify_add_watch(fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO) >= 0:
+                self.inotify = fd
+                self.backlog = self.pdf_files()
+            elif fd >= 0:
+                os.close(fd)
+
+    def is_pdf(self, name):
+        return not name.startswith('.') and name.lower().endswith('.pdf')
+
+    def pdf_files(self):
+        return sorted(entry.path for entry in os.scandir(self.directory) if entry.is_file() and self.is_pdf(entry.name))
+
+    def arrivals(self, timeout):
+        # Waits up to timeout seconds and returns the paths that arrived, a path can be reported again
+        if self.inotify is not None:
+            backlog, self.backlog = self.backlog, []
+            return backlog + self.read_events(0 if backlog else timeout)
+        wait = self.next_scan - time.monotonic()
+        if wait > 0:
+            time.sleep(min(timeout, wait))
+            if time.monotonic() < self.next_scan:
+                return []
+        self.next_scan = time.monotonic() + self.poll_interval
+        sizes = {}
+        for path in self.pdf_files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue  # removed while listing
+            sizes[path] = (stat.st_size, stat.st_mtime_ns)
+        arrived = [path for path, size in sizes.items() if self.seen.get(path) == size]
+        self.seen = sizes
+        return arrived
+
+    def read_events(self, timeout):
+        if not select.select([self.inotify], [], [], timeout)[0]:
+            return []
+        data = os.read(self.inotify, 64 * 1024)
+        arrived = []
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + INOTIFY_EVENT.size:offset + INOTIFY_EVENT.size + length].rstrip(b'\0'))
+            offset += INOTIFY_EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                return self.pdf_files()  # events were dropped, look at everything
+            if self.is_pdf(name):
+                arrived.append(os.path.join(self.directory, name))
+        return arrived
+
+    def close(self):
+        if self.inotify is not None:
+            os.close(self.inotify)
+            self.inotify = None
+
+def move_into(path, directory):
+    # Moves a file into directory, numbering it if the name is taken there
+    base, extension = os.path.splitext(os.path.basename(path))
+    target = os.path.join(directory, base + extension)
+    number = 0
+    while os.path.exists(target):
+        number += 1
+        target = os.path.join(directory, f'{base}_{number}{extension}')
+    shutil.move(path, target)
+    return target
+
+def log(message, file=sys.stdout):
+    print(time.strftime('%Y-%m-%d %H:%M:%S ') + message, file=file, flush=True)
+
+def watch_inbox(arguments):
+    # Daemon mode: signs every PDF dropped into the inbox with the same placements as --batch, until stopped with
+    # Ctrl+C or SIGTERM. Signed originals are moved to done/, PDFs that cannot be signed to the quarantine folder
+    # (with the reason in a .txt next to them), so the inbox only holds what still has to be signed.
+    profile = read_profile(arguments)
+    if profile is None:
+        return 2
+    settings, language, pages, signatures = profile
+    inbox = arguments.watch
+    if not os.path.isdir(inbox):
+        print(f'{inbox}: ' + ('kein Verzeichnis' if language == 'de' else 'not a directory'), file=sys.stderr)
+        return 2
+    outbox = arguments.output_dir or os.path.join(inbox, 'signed')
+    done = os.path.join(inbox, 'done')
+    quarantine = arguments.quarantine or os.path.join(inbox, 'quarantine')
+    if os.path.exists(outbox) and os.path.samefile(outbox, inbox):
+        print('--output-dir: ' + ('darf nicht der Eingangsordner sein' if language == 'de' else 'must not be the inbox'), file=sys.stderr)
+        return 2
+    for directory in (outbox, done, quarantine):
+        os.makedirs(directory, exist_ok=True)
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, stop)
+
+    workers = arguments.workers or settings['saveWorkers'] or os.cpu_count() or 1
+    executor = futures.ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+    watcher = InboxWatcher(inbox, arguments.poll)
+    queue = deque()  # arrived PDFs not yet handed to the pool
+    queued = set()  # ... and those being signed, a PDF reported again meanwhile is not signed twice
+    running = {}  # future -> (pdf path, output path)
+    crashes = {}  # pdf path -> times its worker died
+    signed = total_pages = 0
+    start_time = time.perf_counter()
+
+    def finished(future, pdf_path, output_path):
+        nonlocal signed, total_pages
+        try:
+            page_count, seconds = future.result()
+        except futures.BrokenExecutor:
+            # A worker died, maybe on another document of the same pool: sign it once more before giving up
+            crashes[pdf_path] = crashes.get(pdf_path, 0) + 1
+            if crashes[pdf_path] < 2:
+                queue.appendleft(pdf_path)
+                return
+            error = 'the worker process signing it crashed'
+        except OSError as e:
+            # Not the PDF's fault (outbox full or not writable, file taken away): it stays and is tried when seen again
+            log(f'{pdf_path}: {e}', sys.stderr)
+            queued.discard(pdf_path)
+            return
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        else:
+            signed += 1
+            total_pages += page_count
+            log(f'{pdf_path} -> {output_path}: {page_count} pages in {seconds:.2f} s ({seconds / page_count * 1000:.0f} ms/page)')
+            error = None
+        crashes.pop(pdf_path, None)
+        queued.discard(pdf_path)
+        try:
+            if error is None:
+                move_into(pdf_path, done)
+            else:
+                target = move_into(pdf_path, quarantine)
+                with open(target + '.txt', 'w') as file:
+                    file.write(error + '\n')
+                log(f'{pdf_path}: {error}, moved to {target}', sys.stderr)
+        except OSError as e:
+            log(f'{pdf_path}: {e}', sys.stderr)
+
+    log(f'{inbox}: ' + ('watching with inotify' if watcher.inotify is not None else f'checking every {watcher.poll_interval:g} s')
+        + f', {workers} processes, signed PDFs go to {outbox}')
+    try:
+        while True:
+            for pdf_path in watcher.arrivals(0.1 if running else 1.0):
+                if pdf_path not in queued:
+                    queued.add(pdf_path)
+                    queue.append(pdf_path)
+            # Backpressure: the pool gets two documents per process at most, however many arrive, the rest wait
+            # as names in the queue while their files stay in the inbox
+            while queue and len(running) < 2 * workers:
+                pdf_path = queue.popleft()
+                number = ''
+                output_path = os.path.join(outbox, os.path.basename(signed_pdf_path(pdf_path, language)))
+                while os.path.exists(output_path) and not arguments.overwrite:
+                    number = (number or 0) + 1
+                    output_path = os.path.join(outbox, os.path.basename(signed_pdf_path(pdf_path, language, number)))
+                future = executor.submit(sign_document_job, pdf_path, output_path, pages, signatures, output_options(settings),
+                                         settings['savePagesInFlight'], arguments.auto_place)
+                running[future] = pdf_path, output_path
+            broken = False
+            for future in [future for future in running if future.done()]:
+                broken = broken or isinstance(future.exception(), futures.BrokenExecutor)
+                finished(future, *running.pop(future))
+            if broken:
+                executor.shutdown(wait=False)
+                executor = futures.ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+    except KeyboardInterrupt:
+        log('stopping, waiting for the documents being signed')
+    finally:
+        executor.shutdown(cancel_futures=True)
+        watcher.close()
+    # Signed in the meantime: moved out of the inbox. Interrupted: they stay and are signed at the next start.
+    for future, (pdf_path, output_path) in running.items():
+        if not future.cancelled() and future.exception() is None:
+            finished(future, pdf_path, output_path)
+    elapsed = time.perf_counter() - start_time
+    log(f'{signed} documents, {total_pages} pages in {elapsed:.0f} s: {signed / elapsed * 3600:.0f} documents/h, {total_pages / elapsed * 3600:.0f} pages/h')
+    return 0
+
+def warm_service_worker(signature_paths):
+    # Initializer of the service processes: MuPDF imported and the signatures decoded once, before the first job
+    preload_modules(['fitz'])
+    for signature_path in signature_paths:
+        load_signature_image(signature_path)
+
+class SigningService:
+    # --serve: signs the PDFs sent by --service on processes that stay up, so a job does not pay for starting Python,
+    # importing Qt and MuPDF, reading the settings and decoding the signatures. Listens on localhost only.
+    # POST /sign with a line of JSON {"pages": placements as in --batch, "auto_place": signature index or null,
+    # "options": output settings, "signatures": optional, must be those of the service}, followed by the PDF.
+    # Answers with the signed PDF, 422 if it cannot be signed, 503 while the queue is full.
+    def __init__(self, port, settings, signatures, workers):
+        self.settings = settings
+        self.signatures = signatures
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.executor = self.start_pool()
+        # Backpressure: two jobs per process, waiting or running, further ones are turned away until one is done
+        self.slots = threading.BoundedSemaphore(2 * workers)
+        # Listening only once the processes are ready. http.server only now, it takes longer to import than the window to appear.
+        handler = type('SigningRequestHandler', (SigningRequestHandler, http_server.BaseHTTPRequestHandler), {})
+        try:
+            self.http = http_server.ThreadingHTTPServer(('127.0.0.1', port), handler)
+        except OSError:
+            self.executor.shutdown()
+            raise
+        self.http.daemon_threads = True
+        self.http.service = self
+
+    def start_pool(self):
+        executor = futures.ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                               initializer=warm_service_worker, initargs=([path for path, _ in self.signatures],))
+        futures.wait([executor.submit(preload_modules, []) for _ in range(self.workers)])  # starts the processes now
+        return executor
+
+    def sign(self, job, pdf_data):
+        # Returns the signed PDF and its page count
+        if job.get('signatures', [path for path, _ in self.signatures]) != [path for path, _ in self.signatures]:
+            raise ValueError('the service was started with other signatures')
+        pages = placement_pages(job.get('pages', []), len(self.signatures))
+        auto_place = job.get('auto_place')
+        if auto_place is not None and not 0 <= auto_place < len(self.signatures):
+            raise ValueError(f'signature index {auto_place} out of range, {len(self.signatures)} signatures known')
+        settings = dict(self.settings)
+        settings.update({key: value for key, value in job.get('options', {}).items() if key in SERVICE_OPTIONS})
+        with tempfile.TemporaryDirectory(prefix='pdfsigner-') as directory:
+            pdf_path = os.path.join(directory, os.path.basename(job.get('name') or 'document.pdf'))  # for the error messages
+            output_path = os.path.join(directory, 'signed.pdf')
+            with open(pdf_path, 'wb') as file:
+                file.write(pdf_data)
+            executor = self.executor
+            try:
+                page_count, _ = executor.submit(sign_document_job, pdf_path, output_path, pages, self.signatures,
+                                                output_options(settings), settings['savePagesInFlight'], auto_place).result()
+            except futures.BrokenExecutor:
+                # A process died, e.g. MuPDF crashed on this PDF: the next jobs get new ones
+                with self.lock:
+                    if self.executor is executor:
+                        self.executor = self.start_pool()
+                        executor.shutdown(wait=False)
+                raise
+            with open(output_path, 'rb') as file:
+                return file.read(), page_count
+
+class SigningRequestHandler:
+    # Request handler of SigningService, mixed into http.server.BaseHTTPRequestHandler
+    protocol_version = 'HTTP/1.1'  # keeps the connection of a --service client open for its next PDF
+
+    def do_POST(self):
+        if self.path != '/sign':
+            return self.reply(404, 'unknown path')
+        if self.headers.get('Content-Length') is None:
+            return self.reply(411, 'Content-Length missing')
+        data = self.rfile.read(int(self.headers['Content-Length']))
+        if not self.server.service.slots.acquire(blocking=False):
+            return self.reply(503, 'queue full', {'Retry-After': '1'})
+        start_time = time.perf_counter()
+        try:
+            header, _, pdf_data = data.partition(b'\n')
+            job = json.loads(header)
+            with tracer.span('service job', document=job.get('name')):
+                signed_data, page_count = self.server.service.sign(job, pdf_data)
+        except (ValueError, KeyError, TypeError, RuntimeError) as e:  # bad job or PDF, fitz errors are RuntimeErrors
+            self.reply(422, str(e) or type(e).__name__)
+        except Exception as e:
+            self.reply(500, str(e) or type(e).__name__)
+        else:
+            seconds = time.perf_counter() - start_time
+            log(f"{job.get('name', '?')}: {page_count} pages in {seconds:.2f} s ({seconds / page_count * 1000:.0f} ms/page)")
+            self.reply(200, signed_data, {'Content-Type': 'application/pdf', 'X-Pages': str(page_count)})
+        finally:
+            self.server.service.slots.release()
+
+    def reply(self, status, body, headers={}):
+        if isinstance(body, str):
+            if status != 200:
+                self.log_error('%d %s', status, body)
+            body = (body + '\n').encode()
+            headers = dict(headers, **{'Content-Type': 'text/plain; charset=utf-8'})
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_request(self, code='-', size='-'):
+        pass  # do_POST logs the jobs
+
+    def log_message(self, format, *args):
+        log(f'{self.address_string()}: {format % args}', sys.stderr)
+
+def serve(arguments):
+    # Runs the signing service until stopped with Ctrl+C or SIGTERM. Its signatures are those of the --batch
+    # placements file, or the configured ones, and its settings the defaults for the options of the jobs.
+    profile = read_profile(arguments)
+    if profile is None:
+        return 2
+    settings, _, _, signatures = profile
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, stop)
+
+    workers = arguments.workers or settings['saveWorkers'] or os.cpu_count() or 1
+    try:
+        service = SigningService(arguments.port, settings, signatures, workers)
+    except OSError as e:
+        print(f'--port {arguments.port}: {e}', file=sys.stderr)
+        return 2
+    log(f'signing service on http://127.0.0.1:{arguments.port}/sign, {workers} processes, {len(signatures)} signatures')
+    try:
+        service.http.serve_forever()
+    except KeyboardInterrupt:
+        log('stopping')
+    finally:
+        service.http.server_close()
+        service.executor.shutdown(cancel_futures=True)
+    return 0
+
+def submit_to_service(arguments):
+    # --service: like --batch, but the PDFs are signed by the service started with --serve. Only reads the
+    # placements and settings here, a process per PDF stays cheap.
+    settings = read_settings(PDFSigner.load_settings_info(), config_file('config'))
+    _, language = system_language(settings)
+    job = {'pages': [], 'auto_place': arguments.auto_place, 'options': {key: settings[key] for key in SERVICE_OPTIONS}}
+    if arguments.batch:
+        try:
+            with open(arguments.batch, 'r') as file:
+                placements = json.load(file)
+        except (OSError, ValueError) as e:
+            print(f'{arguments.batch}: {e}', file=sys.stderr)
+            return 2
+        if isinstance(placements, list):
+            placements = {'pages': placements}
+        job['pages'] = placements.get('pages', [])
+        if 'signatures' in placements:
+            job['signatures'] = placements['signatures']
+    pdf_paths, outputs, failures = batch_outputs(arguments, language)
+    if not pdf_paths:
+        return 2
+
+    connections = threading.local()
+
+    def sign(pdf_path, output_path):
+        with open(pdf_path, 'rb') as file:
+            data = json.dumps(dict(job, name=os.path.basename(pdf_path))).encode() + b'\n' + file.read()
+        start_time = time.perf_counter()
+        while True:
+            if not hasattr(connections, 'connection'):
+                connections.connection = http_client.HTTPConnection('127.0.0.1', arguments.port, timeout=600)
+            try:
+                connections.connection.request('POST', '/sign', data, {'Content-Type': 'application/octet-stream'})
+                response = connections.connection.getresponse()
+                body = response.read()
+            except (http_client.HTTPException, ConnectionResetError, BrokenPipeError):
+                del connections.connection  # closed by the service meanwhile, e.g. restarted
+                if time.perf_counter() - start_time > 10:
+                    raise
+                continue
+            if response.status != 503:
+                break
+            time.sleep(float(response.getheader('Retry-After', 1)))
+        if response.status != 200:
+            raise ValueError(body.decode(errors='replace').strip())
+        handle, temp_path = tempfile.mkstemp(prefix='.', suffix='.pdf.part', dir=os.path.dirname(os.path.abspath(output_path)))
+        with os.fdopen(handle, 'wb') as file:
+            file.write(body)
+        os.replace(temp_path, output_path)
+        return int(response.getheader('X-Pages')), time.perf_counter() - start_time
+
+    threads = min(arguments.workers or os.cpu_count() or 1, max(1, len(outputs)))
+    start_time = time.perf_counter()
+    signed = total_pages = 0
+    with futures.ThreadPoolExecutor(threads) as executor:
+        jobs = {pdf_path: executor.submit(sign, pdf_path, output_path) for pdf_path, output_path in outputs.items()}
+        for pdf_path, future in jobs.items():
+            try:
+                page_count, seconds = future.result()
+            except ConnectionRefusedError:
+                print(f'no signing service on port {arguments.port}, start it with --serve', file=sys.stderr)
+                executor.shutdown(cancel_futures=True)
+                return 2
+            except (OSError, ValueError) as e:
+                print(f'{pdf_path}: {e}', file=sys.stderr)
+                failures += 1
+                continue
+            signed += 1
+            total_pages += page_count
+            print(f'{pdf_path} -> {outputs[pdf_path]}: {page_count} pages in {seconds:.2f} s ({seconds / page_count * 1000:.0f} ms/page)')
+    elapsed = time.perf_counter() - start_time
+    print(f'{signed} of {len(pdf_paths)} documents, {total_pages} pages in {elapsed:.2f} s through the service: '
+          f'{signed / elapsed:.2f} documents/s, {total_pages / elapsed:.1f} pages/s')
+    return 1 if failures else 0
+
+def preload_modules(names):
+    for name in names:
+        importlib.import_module(name)
+
+class RenderPool(QObject):
+    # Runs jobs in background processes and delivers their results to the GUI thread
+    rendered = pyqtSignal(object, object)
+    failed = pyqtSignal(object, object)
+    done = pyqtSignal(object, object)
+
+    def __init__(self, workers=1):
+        super().__init__()
+        self.workers = workers
+        self.executor = None
+        self.futures = {}
+        # done is emitted from the executor's thread, the queued connection moves it to the GUI thread
+        self.done.connect(self.deliver, Qt.QueuedConnection)
+
+    def start(self, preload=()):
+        # Start a worker process ahead of the first job, importing the given modules there already.
+        # That job is not delivered.
+        if self.executor is None:
+            self.executor = futures.ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+            self.executor.submit(preload_modules, list(preload))
+
+    def submit(self, key, function, *args):
+        if key in self.futures:
+            return
+        if self.executor is None:
+            self.executor = futures.ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        try:
+            future = self.executor.submit(function, *args)
+        except futures.BrokenExecutor:  # a worker process died, start over
+            self.executor = None
+            return self.submit(key, function, *args)
+        self.futures[key] = future
+        future.add_done_callback(lambda future, key=key: self.done.emit(key, future))
+
+    def deliver(self, key, future):
+        if self.futures.get(key) is not future:
+            return  # cancelled or superseded
+        del self.futures[key]
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            self.failed.emit(key, future.exception())
+        else:
+            self.rendered.emit(key, future.result())
+
+    def cancel_except(self, keys):
+        # Drop queued jobs that are no longer wanted, running ones are ignored when they finish
+        for key in [key for key in self.futures if key not in keys]:
+            self.futures.pop(key).cancel()
+
+    def shutdown(self):
+        self.cancel_except(())
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+class SaveJob(QObject):
+    # Streams the pages of a signed output through a RenderPool (or one by one in this process if pool is None).
+    # At most max_in_flight pages are composed or waiting at a time, finished pages are appended to a temporary
+    # file in batches by writer_pool and output_path is only replaced once the whole file is written.
+    # Pages found in cache (an OutputCache, under the keys from output_page_keys) are not composed again.
+    progress = pyqtSignal(int, int, float)  # pages composed, total pages, seconds for the last page
+    finished = pyqtSignal(bool, str)  # success, error details
+
+    def __init__(self, pool, writer_pool, doc, path, page_sizes, pages, signatures, options, output_path, max_in_flight, cache=None):
+        super().__init__()
+        self.pool = pool
+        self.writer_pool = writer_pool
+        self.doc = doc
+        self.path = path
+        self.page_sizes = page_sizes
+        self.placements = [list(page[1]) for page in pages]
+        self.signatures = signatures
+        self.options = options
+        self.output_path = output_path
+        self.max_in_flight = max_in_flight
+        self.cache = cache if options.get('saveMode') != 'overlay' else None  # nothing composed to keep
+        self.keys = output_page_keys(path, self.placements, signatures, options) if self.cache is not None else None
+        self.cached = set()  # pages taken from the cache
+        self.results = {}
+        self.ready = []  # composed pages in page order, not yet handed to the writer
+        self.next_submit = 0
+        self.next_ready = 0
+        self.written = 0
+        self.writing = False
+        self.compose_scheduled = False
+        self.running = False
+        self.cancelled = False
+        self.error = ''
+        handle, self.temp_path = tempfile.mkstemp(suffix='.pdf', dir=os.path.dirname(os.path.abspath(output_path)))
+        os.close(handle)
+        for connected_pool in {pool, writer_pool} - {None}:
+            connected_pool.rendered.connect(self.job_done)
+            connected_pool.failed.connect(self.job_failed)
+
+    def start(self):
+        self.running = True
+        self.start_time = self.last_time = time.perf_counter()
+        self.trace_start = tracer.now()
+        if self.options.get('saveMode') == 'overlay':
+            return self.write_overlay()
+        if self.cache is not None:
+            for page_number, key in enumerate(self.keys):
+                encoded = self.cache.get(key)
+                if encoded is not None:
+                    self.results[page_number] = encoded
+                    self.cached.add(page_number)
+        if self.next_ready in self.results:
+            self.pages_ready()
+        else:
+            self.fill()
+
+    def skip_cached(self):
+        while self.next_submit in self.cached:
+            self.next_submit += 1
+
+    def fill(self):
+        if self.pool is None:
+            # Compose one page per event loop iteration, so the GUI keeps responding
+            self.skip_cached()
+            if not self.compose_scheduled and self.next_submit < len(self.placements):
+                self.compose_scheduled = True
+                QTimer.singleShot(0, self.compose_here)
+            return
+        self.skip_cached()
+        while self.next_submit < len(self.placements) and self.next_submit - self.written - len(self.ready) < self.max_in_flight:
+            self.pool.submit((self, self.next_submit), compose_output_page_job, self.path, self.next_submit,
+                             self.placements[self.next_submit], self.signatures, self.options)
+            self.next_submit += 1
+            self.skip_cached()
+
+    def compose_here(self):
+        self.compose_scheduled = False
+        if not self.running:
+            return
+        page_number = self.next_submit
+        self.next_submit += 1
+        try:
+            encoded = compose_output_page(self.doc, page_number, self.placements[page_number], self.signatures, self.options)
+        except Exception as e:
+            return self.fail(str(e))
+        self.page_done(page_number, encoded)
+
+    def job_done(self, key, result):
+        if not self.running or key[0] is not self:
+            return
+        if key[1] == 'write':
+            self.batch_written(result)
+        elif not self.cancelled:
+            self.page_done(key[1], result)
+
+    def job_failed(self, key, error):
+        if not self.running or key[0] is not self:
+            return
+        if key[1] == 'write':
+            self.writing = False
+        self.fail(str(error))
+
+    def page_done(self, page_number, encoded):
+        self.results[page_number] = encoded
+        if self.cache is not None:
+            self.cache.put(self.keys[page_number], encoded)
+        if self.next_ready in self.results:
+            self.pages_ready()
+
+    def pages_ready(self):
+        while self.next_ready in self.results:
+            self.ready.append(self.results.pop(self.next_ready))
+            self.next_ready += 1
+        now = time.perf_counter()
+        page_time, self.last_time = now - self.last_time, now
+        # A modal progress dialog processes events here, so only submit more pages afterwards
+        self.progress.emit(self.next_ready, len(self.placements), page_time)
+        if self.running:
+            self.write_batch()
+        if self.running:
+            self.fill()
+
+    def write_batch(self):
+        # Hand every max_in_flight pages to the writer, the fixed batches keep the file layout reproducible
+        if self.writing or not self.ready or (len(self.ready) < self.max_in_flight and self.next_ready < len(self.placements)):
+            return
+        first = self.written == 0
+        batch, self.ready = self.ready[:self.max_in_flight], self.ready[self.max_in_flight:]
+        sizes = self.page_sizes[self.written:self.written + len(batch)]
+        if self.writer_pool is None:
+            try:
+                write_output_batch(self.temp_path, sizes, batch, first, self.options['fixedSeed'])
+            except Exception as e:
+                return self.fail(str(e))
+            self.batch_written(len(batch))
+        else:
+            self.writing = True
+            self.writer_pool.submit((self, 'write'), write_output_batch_job, self.temp_path, sizes, batch, first, self.options['fixedSeed'])
+
+    def write_overlay(self):
+        # saveMode 'overlay': no page is composed, the writer copies the document with the signatures on top
+        if self.writer_pool is None:
+            try:
+                page_count = write_overlay_job(self.path, self.temp_path, self.placements, self.signatures, self.options)
+            except Exception as e:
+                return self.fail(str(e))
+            self.batch_written(page_count)
+        else:
+            self.writing = True
+            self.writer_pool.submit((self, 'write'), write_overlay_job, self.path, self.temp_path, self.placements, self.signatures, self.options)
+
+    def batch_written(self, count):
+        self.writing = False
+        if self.cancelled:
+            return self.finish(False, self.error)
+        self.written += count
+        if self.written == len(self.placements):
+            try:
+                os.replace(self.temp_path, self.output_path)
+            except Exception as e:
+                return self.finish(False, str(e))
+            return self.finish(True, '')
+        self.write_batch()
+        self.fill()
+
+    def fail(self, details):
+        self.error = details
+        self.cancel()
+
+    def finish(self, success, details):
+        tracer.record('save document', self.trace_start, {'pages': len(self.placements), 'cached': len(self.cached), 'success': success})
+        self.running = False
+        self.results.clear()
+        self.ready = []
+        for connected_pool in {self.pool, self.writer_pool} - {None}:
+            connected_pool.rendered.disconnect(self.job_done)
+            connected_pool.failed.disconnect(self.job_failed)
+        if not success and os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+        self.finished.emit(success, details)
+
+    def cancel(self):
+        if not self.running:
+            return
+        self.cancelled = True
+        if self.pool is not None:
+            self.pool.cancel_except(())
+        if not self.writing:
+            # Otherwise the temporary file is removed once the writer has let go of it
+            self.finish(False, self.error)
+
+class RenderScheduler(QObject):
+    # Merges bursts of render requests into at most one fast preview per frame
+    # and a single smooth render once the requests have settled
+    def __init__(self, preview, render, frame_ms=16, idle_ms=150):
+        super().__init__()
+        self.preview = preview
+        self.render = render
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.setInterval(frame_ms)
+        self.frame_timer.timeout.connect(self.run_preview)
+        self.idle_timer = QTimer(self)
+        self.idle_timer.setSingleShot(True)
+        self.idle_timer.setInterval(idle_ms)
+        self.idle_timer.timeout.connect(self.run_render)
+        self.requested = 0
+        self.previews = 0
+        self.renders = 0
+
+    def request(self, preview=True):
+        self.requested += 1
+        if preview and not self.frame_timer.isActive():
+            self.frame_timer.start()
+        self.idle_timer.start()  # restarts the idle period
+
+    def run_preview(self):
+        self.previews += 1
+        self.preview()
+
+    def run_render(self):
+        self.frame_timer.stop()
+        self.renders += 1
+        self.render()
+        if DEBUG:
+            print('render scheduler:', ', '.join(f'{name} {count}' for name, count in self.counters().items()), file=sys.stderr)
+
+    def flush(self):
+        if self.idle_timer.isActive():
+            self.idle_timer.stop()
+            self.run_render()
+
+    def counters(self):
+        # skipped: requests that did not get a smooth render of their own
+        return {'requested': self.requested, 'previews': self.previews, 'renders': self.renders,
+                'skipped': self.requested - self.renders}
+
+class PageCache:
+    # LRU cache of rendered page pixmaps, bounded by an approximate memory budget. Shared by all open documents,
+    # every key starts with the generation of the document it belongs to.
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.pixmaps = OrderedDict()
+        self.used_bytes = 0
+
+    @staticmethod
+    def pixmap_bytes(pixmap):
+        return pixmap.width() * pixmap.height() * pixmap.depth() // 8
+
+    def get(self, key):
+        pixmap = self.pixmaps.get(key)
+        if pixmap is not None:
+            self.pixmaps.move_to_end(key)
+        return pixmap
+
+    def put(self, key, pixmap):
+        if key in self.pixmaps:
+            self.used_bytes -= self.pixmap_bytes(self.pixmaps.pop(key))
+        self.pixmaps[key] = pixmap
+        self.used_bytes += self.pixmap_bytes(pixmap)
+        self.evict()
+
+    def evict(self):
+        # Always keep the most recently used entry, even if it alone exceeds the budget
+        while self.used_bytes > self.budget_bytes and len(self.pixmaps) > 1:
+            _, pixmap = self.pixmaps.popitem(last=False)
+            self.used_bytes -= self.pixmap_bytes(pixmap)
+
+    def set_budget(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.evict()
+
+    def demote(self, generation):
+        # The pixmaps of a document that is not shown any more are the first to go
+        for key in [key for key in self.pixmaps if key[0] == generation]:
+            self.pixmaps.move_to_end(key, last=False)
+
+    def discard(self, generation):
+        for key in [key for key in self.pixmaps if key[0] == generation]:
+            self.used_bytes -= self.pixmap_bytes(self.pixmaps.pop(key))
+
+    def clear(self):
+        self.pixmaps.clear()
+        self.used_bytes = 0
+
+class OutputCache:
+    # LRU cache of encoded output pages by content address (see output_page_keys), bounded by the size of their streams
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.pages = OrderedDict()
+        self.used_bytes = 0
+
+    def get(self, key):
+        encoded = self.pages.get(key)
+        if encoded is not None:
+            self.pages.move_to_end(key)
+        return encoded
+
+    def put(self, key, encoded):
+        if key in self.pages:
+            self.used_bytes -= self.size(self.pages.pop(key))
+        self.pages[key] = encoded
+        self.used_bytes += self.size(encoded)
+        self.evict()
+
+    def size(self, encoded):
+        # (encoded image, text layer) as compose_output_page returns them
+        image, text = encoded
+        return len(image[-1]) + len(text or b'')
+
+    def evict(self):
+        while self.used_bytes > self.budget_bytes and self.pages:
+            _, encoded = self.pages.popitem(last=False)
+            self.used_bytes -= self.size(encoded)
+
+    def set_budget(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.evict()
+
+    def clear(self):
+        self.pages.clear()
+        self.used_bytes = 0
+
+class DiskRenderCache:
+    # Page rasters kept across sessions, by content hash of the PDF, page number and raster size (i.e. resolution).
+    # One file per raster: a 16 byte header and the RGB888 samples as rendered, read back through mmap without
+    # decoding. The least recently used files (by modification time, touched on every hit) go when over budget.
+    HEADER = struct.Struct('<4sIII')  # magic, width, height, stride
+    MAGIC = b'PSR1'
+    SUFFIX = '.raster'
+
+    def __init__(self, directory, budget_bytes):
+        self.directory = directory
+        self.budget_bytes = budget_bytes
+        self.used_bytes = None  # counted on the first write
+
+    def path(self, content_hash, page_number, width, height):
+        return os.path.join(self.directory, f'{content_hash}-{page_number}-{width}x{height}{self.SUFFIX}')
+
+    def get(self, content_hash, page_number, width, height):
+        if not self.budget_bytes or content_hash is None:
+            return None
+        path = self.path(content_hash, page_number, width, height)
+        try:
+            with open(path, 'rb') as file:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, raster_width, raster_height, stride = self.HEADER.unpack_from(mapped)
+            if magic != self.MAGIC or len(mapped) != self.HEADER.size + stride * raster_height:
+                raise ValueError(path)
+            os.utime(path)
+        except (OSError, ValueError, struct.error):
+            return None
+        return raster_width, raster_height, stride, memoryview(mapped)[self.HEADER.size:]
+
+    def put(self, content_hash, page_number, raster):
+        if not self.budget_bytes or content_hash is None:
+            return
+        width, height, stride, samples = raster
+        path = self.path(content_hash, page_number, width, height)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            handle, temp_path = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+            with os.fdopen(handle, 'wb') as file:
+                file.write(self.HEADER.pack(self.MAGIC, width, height, stride))
+                file.write(samples)
+            os.replace(temp_path, path)
+        except OSError:
+            return  # the cache is only an optimization
+        if self.used_bytes is None:
+            self.used_bytes = sum(size for _, size, _ in self.entries())
+        else:
+            self.used_bytes += self.HEADER.size + len(samples)
+        self.evict()
+
+    def entries(self):
+        # (modification time, size, path) of every raster file
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            if name.endswith(self.SUFFIX):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue  # removed by another instance
+                entries.append((stat.st_mtime_ns, stat.st_size, os.path.join(self.directory, name)))
+        return entries
+
+    def evict(self):
+        if self.used_bytes is None or self.used_bytes <= self.budget_bytes:
+            return
+        entries = sorted(self.entries())
+        self.used_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self.used_bytes <= self.budget_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self.used_bytes -= size
+
+    def set_budget(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.evict()
+
+    def clear(self):
+        # Returns the number of bytes freed
+        entries = self.entries()
+        for _, _, path in entries:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.used_bytes = 0
+        return sum(size for _, size, _ in entries)
+
+SIGNATURE_PREVIEW_HEIGHT = 96  # of the signature thumbnails in the toolbar and the manage dialog
+
+class SignatureStore:
+    # Everything the window needs of a signature image, derived once and kept on disk: the trimmed size,
+    # smooth halvings (1/2, 1/4, ... as premultiplied ARGB) and a preview on white. Derivatives are stored by
+    # content hash, an index maps each path to it by modification time and size, so touching a file without
+    # changing it costs one hash. The full resolution image is only decoded when a size beyond the first
+    # halving is needed, or to derive everything the first time.
+    def __init__(self, directory):
+        self.directory = directory
+        self.index_path = os.path.join(directory, 'index.json')
+        try:
+            with open(self.index_path, 'r') as file:
+                self.index = json.load(file)  # path -> [mtime_ns, size, content hash]
+        except (OSError, ValueError):
+            self.index = {}
+        self.entries = {}  # content hash -> metadata, as loaded
+
+    def file(self, content_hash, name):
+        return os.path.join(self.directory, f'{content_hash}-{name}')
+
+    def entry(self, path):
+        # Metadata of the current content of path: {'hash', 'width', 'height', 'levels': [[width, height], ...]}
+        stat = os.stat(path)
+        known = self.index.get(path)
+        if known and known[:2] == [stat.st_mtime_ns, stat.st_size]:
+            content_hash = known[2]
+        else:
+            content_hash = file_content_hash(path)
+            self.index[path] = [stat.st_mtime_ns, stat.st_size, content_hash]
+            self.save_index()
+        entry = self.entries.get(content_hash)
+        if entry is None:
+            try:
+                with open(self.file(content_hash, 'info.json'), 'r') as file:
+                    entry = json.load(file)
+                if not all(os.path.exists(self.file(content_hash, name)) for name in self.derivative_names(entry)):
+                    raise ValueError(content_hash)
+            except (OSError, ValueError):
+                entry = self.derive(path, content_hash)
+            self.entries[content_hash] = entry
+        return entry
+
+    @staticmethod
+    def derivative_names(entry):
+        return ['preview.png'] + [f'level{level}.png' for level in range(1, len(entry['levels']) + 1)]
+
+    def derive(self, path, content_hash):
+        image = trim_signature(read_signature_image(path)).convertToFormat(QImage.Format_ARGB32_Premultiplied)
+        levels = []
+        level = image
+        # The same halvings SignatureCache used to compute on every start
+        while level.width() >= 32 and level.height() >= 32:
+            level = level.scaled(level.width() // 2, level.height() // 2, aspectRatioMode=Qt.KeepAspectRatio, transformMode=Qt.SmoothTransformation)
+            levels.append(level)
+        preview_image = image.scaledToHeight(min(SIGNATURE_PREVIEW_HEIGHT, image.height()), Qt.SmoothTransformation)
+        padding = preview_image.height() // 4
+        preview = QImage(preview_image.width() + 2 * padding, preview_image.height() + 2 * padding, QImage.Format_RGB32)
+        preview.fill(Qt.white)
+        painter = QPainter(preview)
+        painter.drawImage(padding, padding, preview_image)
+        painter.end()
+
+        entry = {'hash': content_hash, 'width': image.width(), 'height': image.height(),
+                 'levels': [[level.width(), level.height()] for level in levels]}
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            preview.save(self.file(content_hash, 'preview.png'))
+            for number, level in enumerate(levels, 1):
+                level.save(self.file(content_hash, f'level{number}.png'))
+            with open(self.file(content_hash, 'info.json'), 'w') as file:
+                json.dump(entry, file)
+        except OSError:
+            pass  # derived again next time
+        # Kept for this session, in case the files could not be written
+        entry['images'] = {'preview.png': preview, **{f'level{number}.png': level for number, level in enumerate(levels, 1)}}
+        return entry
+
+    def image(self, entry, name):
+        image = entry.get('images', {}).get(name)
+        if image is None:
+            image = QImage(self.file(entry['hash'], name))
+        return image
+
+    def preview(self, path):
+        return self.image(self.entry(path), 'preview.png')
+
+    def levels(self, path):
+        # The halvings as premultiplied images, largest first
+        entry = self.entry(path)
+        return [self.image(entry, f'level{number}.png').convertToFormat(QImage.Format_ARGB32_Premultiplied)
+                for number in range(1, len(entry['levels']) + 1)]
+
+    def full(self, path):
+        return load_signature_image(path).convertToFormat(QImage.Format_ARGB32_Premultiplied)
+
+    def save_index(self):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            handle, temp_path = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+            with os.fdopen(handle, 'w') as file:
+                json.dump(self.index, file)
+            os.replace(temp_path, self.index_path)
+        except OSError:
+            pass
+
+class SignatureCache:
+    # Scaled signature pixmaps by (path, width, height), shared by the page compositor and the cursor
+    def __init__(self, store, max_entries=64):
+        self.store = store
+        self.max_entries = max_entries
+        self.pyramids = {}  # path -> [full resolution (loaded when first needed), 1/2, 1/4, ...]
+        self.pixmaps = OrderedDict()
+        self.display_scale = None
+
+    def pyramid(self, path):
+        levels = self.pyramids.get(path)
+        if levels is None:
+            # The halvings come precomputed from the store, every scaled size is derived from the next larger level
+            levels = [None] + [QPixmap.fromImage(image) for image in self.store.levels(path)]
+            self.pyramids[path] = levels
+        return levels
+
+    def get(self, path, width, height):
+        key = (path, width, height)
+        pixmap = self.pixmaps.get(key)
+        if pixmap is not None:
+            self.pixmaps.move_to_end(key)
+            return pixmap
+        levels = self.pyramid(path)
+        source = None
+        for level in reversed(levels[1:]):
+            if level.width() >= width and level.height() >= height:
+                source = level
+                break
+        if source is None:
+            if levels[0] is None:
+                levels[0] = QPixmap.fromImage(self.store.full(path))
+            source = levels[0]
+        pixmap = source.scaled(width, height, aspectRatioMode=Qt.KeepAspectRatio, transformMode=Qt.SmoothTransformation)
+        self.pixmaps[key] = pixmap
+        while len(self.pixmaps) > self.max_entries:
+            self.pixmaps.popitem(last=False)
+        return pixmap
+
+    def set_display_scale(self, display_scale):
+        # Sizes used at another display scale are unlikely to be needed again
+        if display_scale != self.display_scale:
+            self.display_scale = display_scale
+            self.pixmaps.clear()
+
+    def clear(self):
+        self.pyramids.clear()
+        self.pixmaps.clear()
+
+class Document:
+    # One PDF of the session, shown in its own tab. Opened in the background (page count and sizes first), rendered
+    # while its tab is the current one, evicted when another tab becomes current (the MuPDF document and the parsed
+    # pages are released, its page pixmaps are the first to leave the shared page cache) and closed with its tab.
+    # Pages, placements and the position in the document survive the eviction.
+    def __init__(self, pdf_path=None, generation=0):
+        self.pdf_path = pdf_path
+        self.generation = generation  # identifies the document in the jobs of the shared pools and in the page cache
+        self.doc = None  # fitz document, only while the tab is current
+        self.total_pages = 0
+        self.current_page = 0
+        self.pages = []  # [QSize, [(int sig_idx, float zoom, int x, int y)]], raster size at RENDER_DPI and placements
+        self.size_chunks = {}  # page sizes read out of order, by first page number
+        self.content_hash = None  # of the PDF file, the disk cache key
+        self.doc_index = None  # DocumentIndex, built in its own process after loading
+        self.output_seed = None  # skew seed if the settings leave it random
+        self.display_lists = OrderedDict()  # parsed page contents of the last pages, for rendering tiles
+        self.preview_pixmap = None  # (page_number, QPixmap) last fitted page shown, source of fast previews
+        self.display_zoom_factor = 1.0
+        self.isSaved = True
+        self.load_trace_start = None  # tracer.now() when the document was requested
+
+    def evict(self):
+        if self.doc is not None:
+            self.doc.close()
+            self.doc = None
+        self.display_lists.clear()
+        self.preview_pixmap = None
+
+def document_property(name):
+    # Attribute of the document in the current tab, so the window code reads as if there was only one
+    return property(lambda self: getattr(self.document, name), lambda self, value: setattr(self.document, name, value))
+
 class ManageSignaturesDialog(QDialog):
-    def __init__(self, parent, signatures, language, iconSize):
+    def __init__(self, parent, signatures, store, language, iconSize):
         super().__init__(parent)
 
+        self.store = store
         self.language = language
         self.iconSize = iconSize * 2
         self.setGeometry(100, 100, 1600, 1200)
@@ -180,20 +2268,17 @@ class ManageSignaturesDialog(QDialog):
                     error_msg.exec_()
                     continue
 
-                # Load the image with QImageReader to enable automatic alpha channel handling
-                reader = QImageReader(file_path)
-                reader.setAutoTransform(True)
-                image = reader.read()
-
-                signature_pixmap = QPixmap.fromImage(image)
-                target_height = 20
-                signature_scale_factor = target_height / signature_pixmap.height()
-
-                preview_pixmap = QPixmap(signature_pixmap.width() + 100, signature_pixmap.height() + 100)
-                preview_pixmap.fill(Qt.white)
-                painter = QPainter(preview_pixmap)
-                painter.drawPixmap(50, 50, signature_pixmap)
-                painter.end()
+                try:
+                    preview_pixmap = QPixmap.fromImage(self.store.preview(file_path))
+                except OSError as e:
+                    error_msg = QMessageBox()
+                    error_msg.setIcon(QMessageBox.Critical)
+                    error_msg.setWindowTitle('PDF Signer')
+                    error_msg.setText('Signatur konnte nicht geladen werden:' if self.language == 'de' else 'Could not load the signature:')
+                    error_msg.setInformativeText(f'{e}')
+                    error_msg.setStandardButtons(QMessageBox.Ok)
+                    error_msg.exec_()
+                    continue
 
                 # Add the new signature to the table
                 index = self.table.rowCount() - 1
@@ -211,14 +2296,7 @@ class ManageSignaturesDialog(QDialog):
 
     def save_signatures(self):
         try:
-            if platform.system() == 'Windows':
-                signatures_list_file = os.path.expandvars('%APPDATA%\\pdfsigner\\signatures.ini')
-            elif platform.system() == 'Linux':
-                signatures_list_file = os.path.expanduser('~/.config/pdfsigner/signatures.conf')
-            elif platform.system() == 'Darwin':  # MacOS
-                signatures_list_file = os.path.expanduser('~/Library/Application Support/pdfsigner/signatures.conf')
-            else:
-                raise NotImplementedError('Betriebssystem nicht unterstützt' if self.language == 'de' else 'Unsupported operating system')
+            signatures_list_file = config_file('signatures', self.language)
 
             os.makedirs(os.path.dirname(signatures_list_file), exist_ok=True)
 
@@ -252,13 +2330,36 @@ class SettingsDialog(QDialog):
     def init_ui(self):
         layout = QVBoxLayout()
 
-        # Create checkboxes based on loaded settings
+        # Create checkboxes (or labeled spin boxes for numeric values) based on loaded settings
         self.checkboxes = []
+        self.combo_boxes = []
         for key, info in self.settings_info.items():
-            checkbox = QCheckBox(key)
-            checkbox.setChecked(self.settings[key])
-            checkbox.stateChanged.connect(lambda state, key=key: self.update_setting(key, state))
-            layout.addWidget(checkbox)
+            if isinstance(info['value'], bool):
+                checkbox = QCheckBox(key)
+                checkbox.setChecked(self.settings[key])
+                checkbox.stateChanged.connect(lambda state, key=key: self.update_setting(key, state))
+                layout.addWidget(checkbox)
+            elif 'choices' in info:
+                checkbox = QLabel(key)
+                combo_box = QComboBox()
+                combo_box.addItems(info['choices'])
+                combo_box.setCurrentIndex(info['choices'].index(self.settings[key]))
+                combo_box.currentIndexChanged.connect(lambda index, key=key: self.update_value(key, self.settings_info[key]['choices'][index]))
+                row = QHBoxLayout()
+                row.addWidget(checkbox)
+                row.addWidget(combo_box)
+                layout.addLayout(row)
+                self.combo_boxes.append((key, combo_box))
+            else:
+                checkbox = QLabel(key)
+                spin_box = QSpinBox()
+                spin_box.setRange(info['min'], info['max'])
+                spin_box.setValue(self.settings[key])
+                spin_box.valueChanged.connect(lambda value, key=key: self.update_value(key, value))
+                row = QHBoxLayout()
+                row.addWidget(checkbox)
+                row.addWidget(spin_box)
+                layout.addLayout(row)
             self.checkboxes.append((key, checkbox))
 
         # Save and Cancel buttons
@@ -280,36 +2381,83 @@ class SettingsDialog(QDialog):
             self.language = self.locale if state == 0 else 'en'
             self.setTexts(self.language)
 
+    def update_value(self, key, value):
+        self.settings[key] = value
+
     def setTexts(self, language):
         for key, checkbox in self.checkboxes:
             checkbox.setText(self.settings_info[key][f'text_{language}'])
+        for key, combo_box in self.combo_boxes:
+            for index, text in enumerate(self.settings_info[key][f'choices_{language}']):
+                combo_box.setItemText(index, text)
         self.save_button.setText('Speichern' if self.language == 'de' else 'Save')
         self.cancel_button.setText('Abbrechen' if self.language == 'de' else 'Cancel')
         self.setWindowTitle('Einstellungen' if language == 'de' else 'Settings')
 
 class PDFSigner(QMainWindow):
+    pdf_path = document_property('pdf_path')
+    doc = document_property('doc')
+    doc_generation = document_property('generation')
+    total_pages = document_property('total_pages')
+    current_page = document_property('current_page')
+    pages = document_property('pages')
+    size_chunks = document_property('size_chunks')
+    content_hash = document_property('content_hash')
+    doc_index = document_property('doc_index')
+    output_seed = document_property('output_seed')
+    display_lists = document_property('display_lists')
+    preview_pixmap = document_property('preview_pixmap')
+    display_zoom_factor = document_property('display_zoom_factor')
+    isSaved = document_property('isSaved')
+    load_trace_start = document_property('load_trace_start')
+
     def __init__(self, pdf_path=None):
         super().__init__()
+        self.documents = []  # Document of every tab, in tab order
+        self.document = Document()  # of the current tab, an empty one without tabs
+        self.last_generation = 0
+
+        # Opening a document takes a worker process, let it start while the window is built
+        self.open_pool = RenderPool()  # opens documents and reads their page sizes, so a slow file does not block the window
+        if pdf_path:
+            self.open_pool.start(preload=['fitz'])
 
         self.pdf_path = pdf_path
-        self.current_page = 0
-        self.total_pages = 0
-        self.pages = [] # [QPixmap, [(int sig_idx, float zoom, int x, int y)]]
         self.pdf_scale_factor = 1.0
-        self.display_zoom_factor = 1.0
-        self.signatures = [] # [(path, QPixmap, preview QIcon, scale_factor)]
+        self.signatures = [] # [(path, QSize trimmed, preview QIcon, scale_factor)]
+        self.signature_store = SignatureStore(cache_dir('signatures'))
+        self.signature_cache = SignatureCache(self.signature_store)
         self.signature_zoom_factor = 1.0
         self.current_signature_index = -1
         self.signature_activated = False
-        self.doc = None  # Store the loaded PDF document
-        self.isSaved = True
         self.last_page_action_time = time.time()
 
         self.settings_info = self.load_settings_info()
         self.settings = self.load_settings()
+        # Page rasters of all documents by (generation, page_number, width, height), rendered on demand
+        self.page_cache = PageCache(self.settings['pageCacheMB'] * 1024 * 1024)
+        self.disk_cache = DiskRenderCache(cache_dir('pages'), self.settings['diskCacheMB'] * 1024 * 1024)  # the same across sessions
+        self.render_scheduler = RenderScheduler(lambda: self.update_pdf_display(preview=True), self.smooth_render)
+        self.render_pool = RenderPool()
+        self.render_pool.rendered.connect(self.page_rendered)
+        QApplication.instance().aboutToQuit.connect(self.render_pool.shutdown)
+        self.open_pool.rendered.connect(self.document_opened)
+        self.open_pool.failed.connect(self.document_open_failed)
+        QApplication.instance().aboutToQuit.connect(self.open_pool.shutdown)
+        self.index_pool = RenderPool()
+        self.index_pool.rendered.connect(self.document_indexed)
+        QApplication.instance().aboutToQuit.connect(self.index_pool.shutdown)
+        self.thumbnail_pool = RenderPool()  # separate from render_pool, whose prefetch cancels everything else
+        self.thumbnail_pool.rendered.connect(self.thumbnail_rendered)
+        QApplication.instance().aboutToQuit.connect(self.thumbnail_pool.shutdown)
+        self.save_pool = None  # RenderPools for composing and writing the saved pages, kept alive between saves
+        self.save_writer_pool = None
+        self.save_job = None
+        QApplication.instance().aboutToQuit.connect(self.shutdown_save_pool)
+        self.output_cache = OutputCache(self.settings['outputCacheMB'] * 1024 * 1024)  # encoded output pages, a re-save only composes changed pages
 
         self.init_ui()
-        self.load_pdf_document()  # Load the PDF document during initialization
+        self.open_after_paint = True  # the PDF document is loaded once the empty window has been painted
 
     def init_ui(self):
          # Set up the main window
@@ -376,6 +2524,15 @@ class PDFSigner(QMainWindow):
         self.signature_combo_box.setIconSize(self.iconSize)
         toolbar.addWidget(self.signature_combo_box)
 
+        # Add button placing the selected signature at the signature fields and labels found in the document
+        self.auto_place_action = QAction(QIcon.fromTheme('tools-wizard'), '', self)
+        self.auto_place_action.triggered.connect(self.auto_place)
+        self.auto_place_button = QToolButton(self)
+        self.auto_place_button.setToolButtonStyle(Qt.ToolButtonTextUnderIcon)
+        self.auto_place_button.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Expanding)
+        self.auto_place_button.setDefaultAction(self.auto_place_action)
+        toolbar.addWidget(self.auto_place_button)
+
         # Add spacer with separators
         toolbar.addSeparator()
         right_spacer_item = QWidget()
@@ -417,7 +2574,47 @@ class PDFSigner(QMainWindow):
         self.pdf_label.mouseLeft.connect(self.leave_pdf_label)
         self.scroll_area.setWidget(self.pdf_label)
 
-        self.setCentralWidget(self.scroll_area)
+        # One tab per open document, hidden while there is only one
+        self.tab_bar = QTabBar()
+        self.tab_bar.setDocumentMode(True)
+        self.tab_bar.setTabsClosable(True)
+        self.tab_bar.setAutoHide(True)
+        self.tab_bar.setExpanding(False)
+        self.tab_bar.currentChanged.connect(self.activate_document)
+        self.tab_bar.tabCloseRequested.connect(self.close_tab)
+
+        central_widget = QWidget()
+        central_layout = QVBoxLayout()
+        central_layout.setContentsMargins(0, 0, 0, 0)
+        central_layout.setSpacing(0)
+        central_layout.addWidget(self.tab_bar)
+        central_layout.addWidget(self.scroll_area)
+        central_widget.setLayout(central_layout)
+        self.setCentralWidget(central_widget)
+
+        # Page thumbnails on the left, a click jumps to the page
+        self.thumbnail_model = ThumbnailModel(self.thumbnail_pixmap, lambda page_number: len(self.pages[page_number][1]), self.language)
+        self.thumbnail_view = QListView()
+        self.thumbnail_view.setModel(self.thumbnail_model)
+        self.thumbnail_view.setViewMode(QListView.IconMode)
+        self.thumbnail_view.setFlow(QListView.TopToBottom)
+        self.thumbnail_view.setWrapping(False)
+        self.thumbnail_view.setMovement(QListView.Static)
+        self.thumbnail_view.setUniformItemSizes(True)  # no need to ask every row for its size
+        self.thumbnail_view.setIconSize(self.thumbnail_model.placeholder.size())
+        self.thumbnail_view.setSpacing(4)
+        self.thumbnail_view.setFocusPolicy(Qt.NoFocus)  # keep the keys for zooming and placing
+        self.thumbnail_view.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.thumbnail_view.setFixedWidth(THUMBNAIL_WIDTH + 2 * self.thumbnail_view.spacing() + self.thumbnail_view.verticalScrollBar().sizeHint().width() + 8)
+        self.thumbnail_view.clicked.connect(lambda index: self.show_page(index.row()))
+        # Rows scrolled past are not rendered any more, the ones that come into view ask again when painted
+        self.thumbnail_view.verticalScrollBar().valueChanged.connect(lambda value: self.thumbnail_pool.cancel_except(()))
+        self.thumbnail_dock = QDockWidget(self)
+        self.thumbnail_dock.setWidget(self.thumbnail_view)
+        self.thumbnail_dock.setFeatures(QDockWidget.NoDockWidgetFeatures)
+        self.thumbnail_dock.setTitleBarWidget(QWidget())
+        self.thumbnail_dock.setVisible(self.settings['showThumbnails'])
+        self.addDockWidget(Qt.LeftDockWidgetArea, self.thumbnail_dock)
 
         self.setTexts()
         self.update_page_buttons()
@@ -426,51 +2623,57 @@ class PDFSigner(QMainWindow):
         self.showMaximized()
 
     def setTexts(self):
-        self.setWindowTitle('PDF Signieren' if self.language == 'de' else 'PDF Signer')
         self.open_pdf_action.setText('PDF Öffnen …' if self.language == 'de' else 'Open PDF …')
         self.prev_page_action.setText('Vorherige Seite' if self.language == 'de' else 'Previous page')
         self.next_page_action.setText('Nächste Seite' if self.language == 'de' else 'Next page')
         self.toggle_signature_action.setText('Signieren' if self.language == 'de' else 'Place signature')
+        self.auto_place_action.setText('Automatisch platzieren' if self.language == 'de' else 'Place automatically')
         self.save_pdf_action.setText('Signierte PDF Speichern …' if self.language == 'de' else 'Save signed PDF …')
         self.settings_action.setText('Einstellungen …' if self.language == 'de' else 'Settings …')
         self.signature_combo_box.setItemText(self.signature_combo_box.count() - 1, 'Signaturen verwalten …' if self.language == 'de' else 'Manage signatures …')
         #self.setSignatureIcon()
 
-    def load_settings_info(self):
+    @staticmethod
+    def load_settings_info():
         # Dictionary containing settings information
         return {
             'forceEnglish': {'value': False, 'text_de': 'Englisch erzwingen', 'text_en': 'Force English'},
             'autoNextSignature': {'value': True, 'text_de': 'Automatisch zur nächsten Signatur wechseln', 'text_en': 'Switch to next signature automatically'},
+            'autoPlaceSignatures': {'value': False, 'text_de': 'Signatur beim Öffnen automatisch an Unterschriftsfeldern platzieren', 'text_en': 'Place the signature at signature fields when opening'},
+            'saveMode': {'value': 'raster', 'choices': ['raster', 'overlay'],
+                         'choices_de': ['Als Scan (ein Bild pro Seite)', 'Original mit aufgelegter Unterschrift'],
+                         'choices_en': ['As a scan (one image per page)', 'Original with the signature on top'],
+                         'text_de': 'Speichern', 'text_en': 'Save'},
+            'saveText': {'value': False, 'text_de': 'Text der Vorlage unsichtbar hinter dem Bild mitspeichern (durchsuchbar)',
+                         'text_en': 'Keep the text of the original invisibly behind the image (searchable)'},
             'saveGray': {'value': True, 'text_de': 'In Graustufen speichern', 'text_en': 'Use greyscale when saving'},
             'saveSkewed': {'value': True, 'text_de': 'Leicht schief speichern', 'text_en': 'Skew slightly when saving'},
+            'saveScanEffects': {'value': False, 'text_de': 'Scan nachahmen (Versatz, Kontrast, Papierton, Staub)', 'text_en': 'Imitate a scan (offset, contrast, paper tone, dust)'},
+            'scanEngine': {'value': 'numpy', 'choices': ['numpy', 'qpainter'],
+                           'choices_de': ['NumPy (schnell)', 'QPainter'], 'choices_en': ['NumPy (fast)', 'QPainter'],
+                           'text_de': 'Verfahren für die Scan-Nachahmung', 'text_en': 'Scan simulation engine'},
+            'saveEncoding': {'value': 'flate', 'choices': ['flate', 'jpeg', 'bilevel'],
+                             'choices_de': ['Verlustfrei (Flate)', 'JPEG', 'Schwarzweiß (Fax G4)'],
+                             'choices_en': ['Lossless (Flate)', 'JPEG', 'Black and white (fax G4)'],
+                             'text_de': 'Bildkodierung beim Speichern', 'text_en': 'Image encoding when saving'},
+            'saveQuality': {'value': 75, 'min': 1, 'max': 100, 'text_de': 'JPEG-Qualität', 'text_en': 'JPEG quality'},
+            'saveFlateLevel': {'value': 6, 'min': 0, 'max': 9, 'text_de': 'Flate-Kompressionsstufe', 'text_en': 'Flate compression level'},
+            'pageCacheMB': {'value': 256, 'min': 16, 'max': 8192, 'text_de': 'Speicher für Seitenbilder (MB)', 'text_en': 'Memory for page images (MB)'},
+            'outputCacheMB': {'value': 256, 'min': 0, 'max': 8192, 'text_de': 'Speicher für fertige Seiten zum erneuten Speichern (MB)', 'text_en': 'Memory for finished pages to save again (MB)'},
+            'diskCacheMB': {'value': 1024, 'min': 0, 'max': 65536, 'text_de': 'Seitenbilder auf der Festplatte zwischenspeichern (MB, 0 = aus)', 'text_en': 'Keep page images on disk (MB, 0 = off)'},
+            'showThumbnails': {'value': True, 'text_de': 'Seitenvorschau am Rand anzeigen', 'text_en': 'Show page thumbnails at the side'},
+            'prefetchPages': {'value': 2, 'min': 0, 'max': 10, 'text_de': 'Benachbarte Seiten im Voraus laden', 'text_en': 'Neighbouring pages to prepare in advance'},
+            'saveWorkers': {'value': 0, 'min': 0, 'max': 64, 'text_de': 'Prozesse beim Speichern (0 = alle Kerne)', 'text_en': 'Processes used for saving (0 = all cores)'},
+            'savePagesInFlight': {'value': 8, 'min': 1, 'max': 256, 'text_de': 'Seiten gleichzeitig in Arbeit beim Speichern', 'text_en': 'Pages in progress at once when saving'},
+            'skewSeed': {'value': 0, 'min': 0, 'max': 2147483647, 'text_de': 'Startwert für die Schieflage (0 = zufällig)', 'text_en': 'Seed for the skew (0 = random)'},
         }
 
     def load_settings(self):
-        default_settings = {key: info['value'] for key, info in self.settings_info.items()}
-
-        settings = default_settings.copy()
-
-        if platform.system() == 'Windows':
-            self.config_path = os.path.expandvars('%APPDATA%\\pdfsigner\\config.ini')
-        elif platform.system() == 'Linux':
-            self.config_path = os.path.expanduser('~/.config/pdfsigner/config.conf')
-
-        try:
-            with open(self.config_path, 'r') as file:
-                for line in file:
-                    key, value = line.strip().split('=')
-                    if key in default_settings:
-                        settings[key] = value.lower() == 'true'
-        except FileNotFoundError:
-            pass
+        self.config_path = config_file('config')
+        settings = read_settings(self.settings_info, self.config_path)
 
         # Determine language
-        self.locale, _ = locale.getdefaultlocale()
-        self.locale = self.locale[:2]
-        if self.locale == 'de' and not settings['forceEnglish']:
-            self.language = 'de'
-        else:
-            self.language = 'en'
+        self.locale, self.language = system_language(settings)
 
         return settings
 
@@ -488,6 +2691,11 @@ class PDFSigner(QMainWindow):
         if result == QDialog.Accepted:
             self.settings = dialog.settings
             self.language = dialog.language
+            self.page_cache.set_budget(self.settings['pageCacheMB'] * 1024 * 1024)
+            self.output_cache.set_budget(self.settings['outputCacheMB'] * 1024 * 1024)
+            self.disk_cache.set_budget(self.settings['diskCacheMB'] * 1024 * 1024)
+            self.thumbnail_dock.setVisible(self.settings['showThumbnails'])
+            self.thumbnail_model.language = self.language
             self.setTexts()
             self.update_page_buttons()
             self.save_settings()
@@ -498,49 +2706,351 @@ class PDFSigner(QMainWindow):
             file_path, _ = QFileDialog.getOpenFileName(self, 'PDF Öffnen' if self.language == 'de' else 'Open PDF', documents_path, 'PDF-Dateien (*.pdf)' if self.language == 'de' else 'PDF-Files (*.pdf)', options=QFileDialog.Options() | QFileDialog.ReadOnly)
 
         if file_path:
-            self.pdf_path = file_path
-            self.current_page = 0
-            self.load_pdf_document()  # Load the PDF document when opening a new file
+            # A file that is open already is only shown, any other one gets a new tab
+            for index, document in enumerate(self.documents):
+                if os.path.abspath(document.pdf_path) == os.path.abspath(file_path):
+                    self.tab_bar.setCurrentIndex(index)
+                    return
+            self.open_document(file_path)
 
     def load_pdf_document(self):
+        # Open self.pdf_path again in the current tab, or in a new one if there is none yet
         if self.pdf_path:
+            self.open_document(self.pdf_path, replace=self.document in self.documents)
+
+    def open_document(self, pdf_path, replace=False):
+        # Opening happens in the background: the page count and the first page sizes come first, so page 1 is shown
+        # right away, the other page sizes and the content hash follow.
+        self.wait_for_save()  # a save in this process still reads the current document
+        self.last_generation += 1
+        document = Document(pdf_path, self.last_generation)
+        if replace:
+            index = self.documents.index(self.document)
+            self.release_document(self.document)
+            self.documents[index] = document
+            self.tab_bar.setTabText(index, os.path.basename(pdf_path))
+        else:
+            self.documents.append(document)
+            index = self.tab_bar.addTab(os.path.basename(pdf_path))
+        self.tab_bar.setTabToolTip(index, pdf_path)
+        self.open_pool.submit((document.generation, 'open'), open_document_job, pdf_path)
+        document.load_trace_start = tracer.now()
+        if self.tab_bar.currentIndex() != index:
+            self.tab_bar.setCurrentIndex(index)  # activates the document
+        else:
+            self.activate_document(index)
+        importlib.import_module('fitz')  # needed here as well, better now while the worker opens the file
+
+    def activate_document(self, index):
+        # Show the document of a tab. The one shown before is evicted, this one gets its MuPDF document back.
+        document = self.documents[index] if 0 <= index < len(self.documents) else Document()
+        if document is self.document:
+            return
+        self.wait_for_save()  # the save job reads the document shown
+        previous = self.document
+        if previous in self.documents:
+            previous.evict()
+            self.page_cache.demote(previous.generation)
+            self.render_pool.cancel_except(())
+            self.thumbnail_pool.cancel_except(())
+        self.document = document
+        if document.total_pages and document.doc is None:
             try:
-                self.doc = fitz.open(self.pdf_path)
+                document.doc = fitz.open(document.pdf_path)
             except Exception as e:
-                error_msg = QMessageBox()
-                error_msg.setIcon(QMessageBox.Critical)
-                error_msg.setWindowTitle('Fehler' if self.language == 'de' else 'Error')
-                error_msg.setText('Fehler beim Öffnen der PDF-Datei!' if self.language == 'de' else 'Could not open this pdf file!')
-                error_msg.setInformativeText(f'Details: {str(e)}')
-                error_msg.setStandardButtons(QMessageBox.Ok)
-                error_msg.exec_()
+                return self.document_open_failed((document.generation, 'open'), e)
+        self.pdf_label.tile_painter = None
+        self.pdf_label.clear()
+        self.thumbnail_model.set_page_count(0)
+        self.thumbnail_model.set_page_count(len(self.pages))
+        self.update_pdf_display()
+        self.update_page_buttons()
+
+    def close_tab(self, index):
+        document = self.documents[index]
+        if not document.isSaved:
+            self.tab_bar.setCurrentIndex(index)
+            if not self.ask_to_save():
                 return
+        self.close_document(document)
 
-            self.total_pages = self.doc.page_count
+    def close_document(self, document=None):
+        # Close the tab of the document (the current one by default) and release everything rendered from it
+        document = document or self.document
+        if document not in self.documents:
+            return
+        self.wait_for_save()
+        index = self.documents.index(document)
+        self.release_document(document)
+        del self.documents[index]
+        self.tab_bar.removeTab(index)  # activates the next tab if it was the current one
+        if document is self.document:
+            self.activate_document(self.tab_bar.currentIndex())
+
+    def release_document(self, document):
+        for pool in (self.open_pool, self.render_pool, self.index_pool, self.thumbnail_pool):
+            pool.cancel_except([key for key in pool.futures if key[0] != document.generation])
+        document.evict()
+        self.page_cache.discard(document.generation)
+        document.pages = []
+        document.size_chunks.clear()
+        document.doc_index = None
+
+    def document_for(self, generation):
+        for document in self.documents:
+            if document.generation == generation:
+                return document
+        return None  # closed in the meantime
+
+    def document_opened(self, key, result):
+        generation, kind = key[:2]
+        document = self.document_for(generation)
+        if document is None:
+            return
+        current = document is self.document
+        if kind == 'open':
+            tracer.record('open in worker', document.load_trace_start)
+            if current:
+                try:
+                    with tracer.span('open document'):
+                        document.doc = fitz.open(document.pdf_path)
+                except Exception as e:
+                    return self.document_open_failed(key, e)
+            document.total_pages, sizes = result
+            document.output_seed = random.randrange(1, 2**31)
+            self.open_pool.submit((generation, 'hash'), file_content_hash, document.pdf_path)
+            for start in range(OPEN_CHUNK_PAGES, document.total_pages, OPEN_CHUNK_PAGES):
+                self.open_pool.submit((generation, 'sizes', start), page_raster_sizes_job, document.pdf_path, start, start + OPEN_CHUNK_PAGES)
+            document.size_chunks[0] = sizes
+        elif kind == 'hash':
+            document.content_hash = result
+            return
+        else:
+            document.size_chunks[key[2]] = result
+
+        # Only the page sizes are needed up front, the rasters are rendered when displayed
+        while len(document.pages) in document.size_chunks:
+            document.pages.extend([QSize(*size), []] for size in document.size_chunks.pop(len(document.pages)))
+        if len(document.pages) == document.total_pages:
+            tracer.record('load document', document.load_trace_start, {'pages': document.total_pages})
+            # Look for signature fields and labels in the background, auto placement needs all pages
+            self.index_pool.submit((generation,), index_document_job, document.pdf_path)
+        if current:
+            self.thumbnail_model.set_page_count(len(self.pages))
+            if kind == 'open':
+                with tracer.span('show first page'):
+                    self.update_pdf_display()
+            self.update_page_buttons()
 
-            for page_number in range(self.total_pages):
-                page = self.doc.load_page(page_number)
-                pixmap = page.get_pixmap(matrix=fitz.Matrix(150/72.0, 150/72.0))  # Set DPI to 150
-                image = QImage(pixmap.samples, pixmap.width, pixmap.height, pixmap.stride, QImage.Format_RGB888)
-                qt_pixmap = QPixmap.fromImage(image)
-                self.pages.append([qt_pixmap, []])
+    def document_open_failed(self, key, error):
+        document = self.document_for(key[0])
+        if document is None:
+            return
+        self.close_document(document)
+        self.update_page_buttons()
+        error_msg = QMessageBox()
+        error_msg.setIcon(QMessageBox.Critical)
+        error_msg.setWindowTitle('Fehler' if self.language == 'de' else 'Error')
+        error_msg.setText('Fehler beim Öffnen der PDF-Datei!' if self.language == 'de' else 'Could not open this pdf file!')
+        error_msg.setInformativeText(f'Details: {str(error)}')
+        error_msg.setStandardButtons(QMessageBox.Ok)
+        error_msg.exec_()
+
+    def get_page_pixmap(self, page_number, size=None):
+        # Page raster at RENDER_DPI, or rendered directly at the given display size
+        if size is None:
+            size = self.pages[page_number][0]
+        key = (self.doc_generation, page_number, size.width(), size.height())
+        pdf_pixmap = self.page_cache.get(key)
+        if pdf_pixmap is None:
+            with tracer.span('read disk cache'):
+                raster = self.disk_cache.get(self.content_hash, *key[1:])
+            if raster is None:
+                raster = render_page_raster(self.doc.load_page(page_number), size.width(), size.height())
+                with tracer.span('write disk cache'):
+                    self.disk_cache.put(self.content_hash, page_number, raster)
+            with tracer.span('to pixmap'):
+                pdf_pixmap = raster_to_pixmap(raster)
+            self.page_cache.put(key, pdf_pixmap)
+        return pdf_pixmap
 
-            self.update_pdf_display()
-            self.update_page_buttons()
-            #self.isSaved = False
+    def fit_scale_factor(self, page_size):
+        return min((self.scroll_area.width() - self.scroll_area.verticalScrollBar().width() - 2) / page_size.width(),
+                   (self.scroll_area.height() - self.scroll_area.horizontalScrollBar().height() - 2) / page_size.height())
+
+    def fit_size(self, page_number):
+        page_size = self.pages[page_number][0]
+        return page_size * self.fit_scale_factor(page_size)
 
-    def update_pdf_display(self):
-        if not self.doc:
+    def update_pdf_display(self, preview=False):
+        if not self.doc or not self.pages:
             return
 
-        pdf_pixmap = self.assemble_pixmap(self.pages[self.current_page], self.display_zoom_factor)
-        self.pdf_label.setFixedSize(pdf_pixmap.width(), pdf_pixmap.height())
-        self.pdf_label.setPixmap(pdf_pixmap)
+        page_size = self.pages[self.current_page][0]
+        if self.display_zoom_factor == 1.0:
+            size = self.fit_size(self.current_page)
+            if (preview and self.preview_pixmap and self.preview_pixmap[0] == self.current_page
+                    and (self.doc_generation, self.current_page, size.width(), size.height()) not in self.page_cache.pixmaps):
+                # Stretch what is already shown until the smooth render follows
+                self.pdf_scale_factor = self.fit_scale_factor(page_size)
+                pdf_pixmap = self.preview_pixmap[1].scaled(size, transformMode=Qt.FastTransformation)
+            else:
+                self.signature_cache.set_display_scale(self.fit_scale_factor(page_size))
+                pdf_pixmap = self.assemble_pixmap(self.current_page, self.display_zoom_factor)
+                self.preview_pixmap = (self.current_page, pdf_pixmap)
+            self.pdf_label.tile_painter = None
+            self.pdf_label.setFixedSize(pdf_pixmap.width(), pdf_pixmap.height())
+            self.pdf_label.setPixmap(pdf_pixmap)
+        else:
+            # Zoomed in: only the visible tiles are rendered, at the effective resolution
+            self.pdf_scale_factor = self.fit_scale_factor(page_size)
+            self.signature_cache.set_display_scale(self.pdf_scale_factor * self.display_zoom_factor)
+            self.pdf_label.clear()
+            if preview:
+                self.pdf_label.tile_painter = lambda painter, rect: self.paint_tiles(painter, rect, preview=True)
+            else:
+                self.pdf_label.tile_painter = self.paint_tiles
+            self.pdf_label.setFixedSize(page_size * (self.pdf_scale_factor * self.display_zoom_factor))
+            self.pdf_label.update()
+        if not preview:
+            self.prefetch_pages()
+
+    def smooth_render(self):
+        self.update_pdf_display()
+        self.draw_signature_cursor()
+
+    def get_display_list(self, page_number):
+        display_list = self.display_lists.pop(page_number, None)
+        if display_list is None:
+            display_list = self.doc.load_page(page_number).get_displaylist()
+        self.display_lists[page_number] = display_list
+        while len(self.display_lists) > 3:
+            self.display_lists.popitem(last=False)
+        return display_list
+
+    def paint_tiles(self, painter, rect, preview=False):
+        page_size, signatures = self.pages[self.current_page]
+        scale_factor = self.pdf_scale_factor * self.display_zoom_factor
+        size = self.pdf_label.size()
+        for row in range(max(0, rect.top() // TILE_SIZE), min(rect.bottom(), size.height() - 1) // TILE_SIZE + 1):
+            for column in range(max(0, rect.left() // TILE_SIZE), min(rect.right(), size.width() - 1) // TILE_SIZE + 1):
+                # Tiles are cached per zoom level, i.e. per displayed page size
+                key = (self.doc_generation, self.current_page, size.width(), size.height(), column, row)
+                tile = self.page_cache.get(key)
+                if tile is None:
+                    tile_rect = QRect(column * TILE_SIZE, row * TILE_SIZE, TILE_SIZE, TILE_SIZE).intersected(QRect(QPoint(0, 0), size))
+                    if preview and self.preview_pixmap and self.preview_pixmap[0] == self.current_page:
+                        # Stretch the matching part of the fitted page, the smooth render follows
+                        source = self.preview_pixmap[1]
+                        ratio = source.width() / size.width()
+                        painter.drawPixmap(QRectF(tile_rect), source,
+                                           QRectF(tile_rect.x() * ratio, tile_rect.y() * ratio, tile_rect.width() * ratio, tile_rect.height() * ratio))
+                        continue
+                    display_list = self.get_display_list(self.current_page)
+                    tile = raster_to_pixmap(render_tile_raster(display_list, display_list.rect, size.width(), size.height(), tile_rect))
+                    self.page_cache.put(key, tile)
+                painter.drawPixmap(column * TILE_SIZE, row * TILE_SIZE, tile)
+        for sig in signatures:
+            signature_pixmap = self.scaled_signature(sig[0], sig[1] * scale_factor)
+            target = QRect(int(sig[2] * scale_factor), int(sig[3] * scale_factor), signature_pixmap.width(), signature_pixmap.height())
+            if target.intersects(rect):
+                painter.drawPixmap(target.topLeft(), signature_pixmap)
+
+    def prefetch_pages(self):
+        # Render the pages around the current one in the background, already fitted to the viewport
+        keys = []
+        for distance in range(1, self.settings['prefetchPages'] + 1):
+            for page_number in (self.current_page + distance, self.current_page - distance):
+                if 0 <= page_number < len(self.pages):
+                    size = self.fit_size(page_number)
+                    key = (self.doc_generation, page_number, size.width(), size.height())
+                    if size.isEmpty() or self.page_cache.get(key) is not None:
+                        continue
+                    raster = self.disk_cache.get(self.content_hash, page_number, size.width(), size.height())
+                    if raster is not None:
+                        self.page_cache.put(key, raster_to_pixmap(raster))
+                        continue
+                    keys.append(key)
+                    self.render_pool.submit(key, render_page_job, self.pdf_path, page_number, size.width(), size.height())
+        self.render_pool.cancel_except(keys)
+
+    def page_rendered(self, key, raster):
+        generation, page_number, width, height = key
+        if generation == self.doc_generation:
+            self.page_cache.put(key, raster_to_pixmap(raster))
+            self.disk_cache.put(self.content_hash, page_number, raster)
+
+    def thumbnail_pixmap(self, page_number):
+        # Thumbnail of a page if rendered already, otherwise None and it is rendered in the background
+        page_size = self.pages[page_number][0]
+        size = page_size * min(THUMBNAIL_WIDTH / page_size.width(), 1.5 * THUMBNAIL_WIDTH / page_size.height())
+        key = (self.doc_generation, page_number, max(1, size.width()), max(1, size.height()))
+        pixmap = self.page_cache.get(key)
+        if pixmap is None:
+            raster = self.disk_cache.get(self.content_hash, *key[1:])
+            if raster is None:
+                # The view also asks for the last rows when they are added, only render the visible ones
+                if self.thumbnail_view.viewport().rect().intersects(self.thumbnail_view.visualRect(self.thumbnail_model.index(page_number))):
+                    self.thumbnail_pool.submit(key, render_page_job, self.pdf_path, *key[1:])
+                return None
+            pixmap = raster_to_pixmap(raster)
+            self.page_cache.put(key, pixmap)
+        return pixmap
+
+    def thumbnail_rendered(self, key, raster):
+        generation, page_number, width, height = key
+        if generation == self.doc_generation:
+            self.page_cache.put(key, raster_to_pixmap(raster))
+            self.disk_cache.put(self.content_hash, page_number, raster)
+            self.thumbnail_model.page_changed(page_number)
+
+    def document_indexed(self, key, index):
+        document = self.document_for(key[0])
+        if document is None:
+            return
+        document.doc_index = index
+        if document is not self.document:
+            return
+        self.update_page_buttons()
+        if self.settings['autoPlaceSignatures'] and self.current_signature_index > -1:
+            self.auto_place(quiet=True)
+
+    def auto_place(self, checked=False, quiet=False):
+        if self.doc_index is None or self.current_signature_index < 0:
+            return
+        signature_size = self.signatures[self.current_signature_index][1]
+        proposals = propose_placements(self.doc_index, self.current_signature_index, signature_size.width() / signature_size.height())
+        placed = 0
+        for page_number, placements in proposals.items():
+            for placement in placements:
+                if placement not in self.pages[page_number][1]:
+                    self.pages[page_number][1].append(placement)
+                    self.thumbnail_model.page_changed(page_number)
+                    placed += 1
+        if placed:
+            self.isSaved = False
+            # Show the first page that got a signature
+            self.current_page = min(proposals)
+            self.display_zoom_factor = 1.0
+            self.update_pdf_display()
+            self.update_page_buttons()
+        elif not quiet:
+            info_msg = QMessageBox()
+            info_msg.setIcon(QMessageBox.Information)
+            info_msg.setWindowTitle('PDF Signer')
+            info_msg.setText('Keine neuen Stellen zum Unterschreiben gefunden.' if self.language == 'de' else 'No new places to sign found.')
+            info_msg.setStandardButtons(QMessageBox.Ok)
+            info_msg.exec_()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.open_after_paint:
+            self.open_after_paint = False
+            QTimer.singleShot(0, self.load_pdf_document)
 
     def resizeEvent(self, event):
         if hasattr(self, 'scroll_area'):
-            self.update_pdf_display()
-            self.draw_signature_cursor()
+            self.render_scheduler.request()
 
     def enter_pdf_label(self):
         if self.signature_activated:
@@ -575,6 +3085,7 @@ class PDFSigner(QMainWindow):
             cursor = self.pdf_label.mapFrom(self, event.pos())
             cursor /= self.pdf_scale_factor * self.display_zoom_factor  # Normalize
             self.pages[self.current_page][1].append((self.current_signature_index, self.signature_zoom_factor, cursor.x(), cursor.y()))
+            self.thumbnail_model.page_changed(self.current_page)
             self.toggle_signature()
             self.update_pdf_display()
             if self.settings['autoNextSignature']:
@@ -604,12 +3115,13 @@ class PDFSigner(QMainWindow):
 
                 # Zoom into/out of the PDF pixmap
                 if delta < 0 and self.display_zoom_factor < 3.0:
-                    self.display_zoom_factor = min(3.0, self.display_zoom_factor + 0.1)
+                    self.display_zoom_factor = round(min(3.0, self.display_zoom_factor + 0.1), 1)
                 elif delta > 0 and self.display_zoom_factor > 1.0:
-                    self.display_zoom_factor = max(1.0, self.display_zoom_factor - 0.1)
+                    self.display_zoom_factor = round(max(1.0, self.display_zoom_factor - 0.1), 1)
 
-                # Update the PDF display
-                self.update_pdf_display()
+                # Update the PDF display with a fast preview, the smooth render follows once zooming pauses
+                self.update_pdf_display(preview=True)
+                self.render_scheduler.request(preview=False)
 
                 # Calculate the new position of the cursor in relation to the PDF pixmap after zoom
                 pdf_cursor_pos_after_zoom = self.pdf_label.mapFrom(self, cursor_pos)
@@ -630,40 +3142,50 @@ class PDFSigner(QMainWindow):
             self.draw_signature_cursor()
 
     def update_page_buttons(self):
-        if self.total_pages>0:
+        # Pages whose size is not known yet cannot be shown, saving needs all of them
+        loaded = len(self.pages)
+        if loaded > 0:
             self.prev_page_button.setEnabled(self.current_page > 0)
-            self.next_page_button.setEnabled(self.current_page < self.total_pages - 1)
-            self.save_pdf_button.setEnabled(True)
+            self.next_page_button.setEnabled(self.current_page < loaded - 1)
+            self.save_pdf_button.setEnabled(loaded == self.total_pages)
+            self.thumbnail_view.setCurrentIndex(self.thumbnail_model.index(self.current_page))
         else:
             self.prev_page_button.setEnabled(False)
             self.next_page_button.setEnabled(False)
             self.save_pdf_button.setEnabled(False)
+        self.auto_place_button.setEnabled(self.doc_index is not None)
+
+        title = 'PDF Signieren' if self.language == 'de' else 'PDF Signer'
+        if self.document in self.documents:
+            if not loaded:
+                position = 'wird geöffnet …' if self.language == 'de' else 'opening …'
+            elif loaded < self.total_pages:
+                position = (f'Seite {self.current_page + 1} von {self.total_pages} ({loaded} geladen)' if self.language == 'de' else
+                            f'page {self.current_page + 1} of {self.total_pages} ({loaded} loaded)')
+            else:
+                position = f'Seite {self.current_page + 1} von {self.total_pages}' if self.language == 'de' else f'page {self.current_page + 1} of {self.total_pages}'
+            title += f' – {os.path.basename(self.pdf_path)}, {position}'
+        self.setWindowTitle(title)
 
     def prev_page(self):
         if self.current_page > 0:
-            self.current_page -= 1
-            self.display_zoom_factor = 1.0
-            self.update_pdf_display()
-            self.update_page_buttons()
+            self.show_page(self.current_page - 1)
 
     def next_page(self):
-        if self.current_page < self.total_pages - 1:
-            self.current_page += 1
+        if self.current_page < len(self.pages) - 1:
+            self.show_page(self.current_page + 1)
+
+    def show_page(self, page_number):
+        # Only the page shown is rendered, not the ones skipped
+        if 0 <= page_number < len(self.pages):
+            self.current_page = page_number
             self.display_zoom_factor = 1.0
             self.update_pdf_display()
             self.update_page_buttons()
 
     def load_signatures(self):
         try:
-            if platform.system() == 'Windows':
-                signatures_list_file = os.path.expandvars('%APPDATA%\\pdfsigner\\signatures.ini')
-            elif platform.system() == 'Linux':
-                signatures_list_file = os.path.expanduser('~/.config/pdfsigner/signatures.conf')
-            elif platform.system() == 'Darwin':  # MacOS
-                signatures_list_file = os.path.expanduser('~/Library/Application Support/pdfsigner/signatures.conf')
-            else:
-                # Handle other platforms or raise an exception if not supported
-                raise NotImplementedError('Betriebssystem nicht unterstützt' if self.language == 'de' else 'Unsupported operating system')
+            signatures_list_file = config_file('signatures', self.language)
         except Exception as e:
             error_msg = QMessageBox()
             error_msg.setIcon(QMessageBox.Critical)
@@ -674,16 +3196,13 @@ class PDFSigner(QMainWindow):
             error_msg.exec_()
             sys.exit(1)
 
-        try:
-            with open(signatures_list_file, 'r') as file:
-                signature_path_list = [line.strip() for line in file]
-        except Exception as e:
-            signature_path_list = []
+        signature_path_list = read_signature_list(signatures_list_file)
 
         #
         if self.signature_combo_box.count() > 0:
             # reset on reload after saving manage dialog
             self.signatures = []
+            self.signature_cache.clear()
             # save manage action item text
             manage_text = self.signature_combo_box.itemText(self.signature_combo_box.count() - 1)
             self.signature_combo_box.clear()
@@ -692,32 +3211,21 @@ class PDFSigner(QMainWindow):
             manage_text = ''
 
         for signature_path in signature_path_list:
-            if os.path.exists(signature_path):
-                # Load the image with QImageReader to enable automatic alpha channel handling
-                reader = QImageReader(signature_path)
-                if not reader.size().isValid():
-                    continue
-                reader.setAutoTransform(True)
-                image = reader.read()
-
-                signature_pixmap = QPixmap.fromImage(image)
-                target_height = 20
-                signature_scale_factor = target_height / signature_pixmap.height()
-
-                preview_pixmap = QPixmap(signature_pixmap.width() + 100, signature_pixmap.height() + 100)
-                preview_pixmap.fill(Qt.white)
-                painter = QPainter(preview_pixmap)
-                painter.drawPixmap(50, 50, signature_pixmap)
-                painter.end()
-
-                self.signatures.append((signature_path, signature_pixmap, QIcon(preview_pixmap), signature_scale_factor))
-                self.signature_combo_box.addItem(QIcon(preview_pixmap), '')
+            # Only the size and the preview are needed up front, the store derives them once per image
+            try:
+                entry = self.signature_store.entry(signature_path)
+                preview_icon = QIcon(QPixmap.fromImage(self.signature_store.preview(signature_path)))
+            except OSError:
+                continue
+            signature_scale_factor = SIGNATURE_HEIGHT / entry['height']
+            self.signatures.append((signature_path, QSize(entry['width'], entry['height']), preview_icon, signature_scale_factor))
+            self.signature_combo_box.addItem(preview_icon, '')
 
         self.signature_combo_box.addItem(manage_text)
         self.selectSignature()
 
     def manage_signatures(self):
-        dialog = ManageSignaturesDialog(self, self.signatures, self.language, self.iconSize)
+        dialog = ManageSignaturesDialog(self, self.signatures, self.signature_store, self.language, self.iconSize)
         result = dialog.exec_()
         if result == QDialog.Accepted:
             self.load_signatures()
@@ -749,13 +3257,8 @@ class PDFSigner(QMainWindow):
 
     def draw_signature_cursor(self):
         if self.signature_activated:
-            _, signature_pixmap, _, signature_scale_factor = self.signatures[self.current_signature_index]
-            scale_factor = signature_scale_factor * self.signature_zoom_factor * self.display_zoom_factor * self.pdf_scale_factor
-            self.signature_cursor = QCursor(signature_pixmap.scaled(
-                                        int(signature_pixmap.width() * scale_factor),
-                                        int(signature_pixmap.height() * scale_factor),
-                                        aspectRatioMode=Qt.KeepAspectRatio,
-                                        transformMode=Qt.SmoothTransformation), 0, 0)
+            scale_factor = self.signature_zoom_factor * self.display_zoom_factor * self.pdf_scale_factor
+            self.signature_cursor = QCursor(self.scaled_signature(self.current_signature_index, scale_factor), 0, 0)
             self.setCursor(self.signature_cursor)
 
     def selectSignature(self, index = -1):
@@ -786,11 +3289,11 @@ class PDFSigner(QMainWindow):
     #         self.toggle_signature_button.setIcon(self.toggle_signature_action.icon())
 
     def save_pdf(self, skip = False):
-        if not self.doc:
+        if not self.doc or self.save_job is not None or len(self.pages) < self.total_pages:
             return
 
         # Save the modified PDF
-        new_pdf_path = os.path.splitext(self.pdf_path)[0] + ('_signiert' if self.language == 'de' else '_signed') + '.pdf'
+        new_pdf_path = signed_pdf_path(self.pdf_path, self.language)
 
         choice = None
         tries = 0
@@ -811,62 +3314,74 @@ class PDFSigner(QMainWindow):
 
                 choice = msg_box.exec_()
             if choice == 1:
-                new_pdf_path = os.path.splitext(self.pdf_path)[0] + ('_signiert' if self.language == 'de' else '_signed') + f'{tries}' + '.pdf'
+                new_pdf_path = signed_pdf_path(self.pdf_path, self.language, tries)
             elif choice == 2:
                 return
 
-        new_pdf_document = fitz.open()
-
-        for page_number, page in enumerate(self.pages):
-
-            pdf_pixmap = self.assemble_pixmap(page, 1.0, noScale = True)
-
-            image = pdf_pixmap.toImage()
-            if self.settings['saveGray']:
-                image = image.convertToFormat(QImage.Format_Grayscale8)
-
-            if self.settings['saveSkewed']:
-                rotation_angle = random.uniform(0.1, 0.5)
-
-                # Create a blank QImage with the same size as image
-                rotated_image = QImage(image.size(), QImage.Format_RGB32)
-                rotated_image.fill(Qt.white)
-
-                # Perform the rotation using a QPainter
-                painter = QPainter(rotated_image)
-                painter.setRenderHint(QPainter.Antialiasing, False)  # Set anti-aliasing to False
-                painter.setRenderHint(QPainter.SmoothPixmapTransform, True)
-                painter.translate(image.width() / 2, image.height() / 2)
-                painter.rotate(rotation_angle)
-                target_rect = QRectF(-image.width() / 2, -image.height() / 2, image.width(), image.height())
-                painter.drawImage(target_rect, image)
-                painter.end()
-                image = rotated_image
-
-            byte_array = QByteArray()
-            buffer = QBuffer(byte_array)
-            buffer.open(QBuffer.WriteOnly)
-            image.save(buffer, 'PNG')
-
-            # Get raw bytes from QByteArray
-            byte_array = buffer.data()
-            image_bytes = bytearray(byte_array.data())
-
-            # Create a fitz.Pixmap from the bytes-like object
-            fitz_pixmap = fitz.Pixmap(image_bytes)
-
-            new_page = new_pdf_document.new_page(-1, self.doc[page_number].rect.width, self.doc[page_number].rect.height)
+        # Compose the pages in the background, the GUI stays responsive and shows the progress
+        pool, writer_pool = self.get_save_pools()
+        page_sizes = [(self.doc[page_number].rect.width, self.doc[page_number].rect.height) for page_number in range(self.total_pages)]
+        signatures = [(signature[0], signature[3]) for signature in self.signatures]
+        self.save_job = SaveJob(pool, writer_pool, self.doc, self.pdf_path, page_sizes, self.pages, signatures,
+                                output_options(self.settings, self.output_seed), new_pdf_path, self.settings['savePagesInFlight'],
+                                self.output_cache)
+
+        self.save_progress = QProgressDialog('', 'Abbrechen' if self.language == 'de' else 'Cancel', 0, self.total_pages, self)
+        self.save_progress.setWindowTitle('Speichern …' if self.language == 'de' else 'Saving …')
+        self.save_progress.setWindowModality(Qt.WindowModal)
+        self.save_progress.setMinimumDuration(500)
+        self.save_progress.setValue(0)
+        self.save_progress.canceled.connect(self.save_job.cancel)
+        self.save_job.progress.connect(self.save_progressed)
+        self.save_job.finished.connect(lambda success, details: self.save_finished(success, details, new_pdf_path, skip))
+        self.save_job.start()
+
+    def save_progressed(self, done, total, page_time):
+        average = (time.perf_counter() - self.save_job.start_time) / done
+        cached = len(self.save_job.cached)
+        self.save_progress.setLabelText(f'Seite {done} von {total}, {cached} unverändert\n{page_time * 1000:.0f} ms/Seite (Durchschnitt {average * 1000:.0f} ms)'
+                                        if self.language == 'de' else
+                                        f'Page {done} of {total}, {cached} unchanged\n{page_time * 1000:.0f} ms/page (average {average * 1000:.0f} ms)')
+        self.save_progress.setValue(done)
+
+    def wait_for_save(self):
+        # Keep the events going until a running save has finished or was cancelled
+        if self.save_job is not None:
+            loop = QEventLoop()
+            self.save_job.finished.connect(loop.quit)
+            loop.exec_()
+
+    def save_finished(self, success, details, new_pdf_path, skip):
+        placements = self.save_job.placements
+        cached = len(self.save_job.cached)
+        seconds = time.perf_counter() - self.save_job.start_time
+        self.save_job = None
+        self.save_progress.canceled.disconnect()
+        self.save_progress.close()
+        self.save_progress.deleteLater()
+        self.save_progress = None
+
+        if not success:
+            if details:
+                error_msg = QMessageBox()
+                error_msg.setIcon(QMessageBox.Critical)
+                error_msg.setWindowTitle('Fehler' if self.language == 'de' else 'Error')
+                error_msg.setText('Konnte die PDF nicht speichern' if self.language == 'de' else 'Could not save the PDF.')
+                error_msg.setInformativeText(f'Details: {details}')
+                error_msg.setStandardButtons(QMessageBox.Ok)
+                error_msg.exec_()
+            return
 
-            new_page.insert_image(self.doc[page_number].rect, pixmap=fitz_pixmap)
-
-        new_pdf_document.save(new_pdf_path)
-        new_pdf_document.close()
-        self.isSaved = True
+        # Placements added while saving are not part of the file
+        self.isSaved = placements == [page[1] for page in self.pages]
 
         if not skip:
             options_box = QMessageBox()
             options_box.setWindowTitle('Was nun?' if self.language == 'de' else 'What next?')
             options_box.setText(('Signierte PDF gespeichert unter:'  if self.language == 'de' else 'Saved signed PDF as:') + f'\n{new_pdf_path}')
+            options_box.setInformativeText(f'{len(placements)} Seiten in {seconds:.1f} s, davon {cached} unverändert übernommen'
+                                           if self.language == 'de' else
+                                           f'{len(placements)} pages in {seconds:.1f} s, {cached} of them reused unchanged')
             options_box.setIcon(QMessageBox.Question)
 
             option_open_file_button = options_box.addButton('PDF anzeigen' if self.language == 'de' else 'Open PDF', QMessageBox.ActionRole)
@@ -928,61 +3443,145 @@ class PDFSigner(QMainWindow):
             else:
                 pass
 
-    def closeEvent(self, event):
-        if not self.isSaved:
-            msgbox = QMessageBox()
-            msgbox.setIcon(QMessageBox.Question)
-            msgbox.setWindowTitle('Speichern?' if self.language == 'de' else 'Save?')
-            msgbox.setText('Es liegen ungespeicherte Änderungen vor!\nVor dem Schließen speichern?'    if self.language == 'de' else 'There are unsaved changes!\nSave before quitting?')
-            save_button = msgbox.addButton('Speichern'  if self.language == 'de' else 'Save', QMessageBox.YesRole)
-            discard_button = msgbox.addButton('Verwerfen'  if self.language == 'de' else 'Discard', QMessageBox.NoRole)
-            cancel_button = msgbox.addButton('Abbrechen'  if self.language == 'de' else 'Cancel', QMessageBox.RejectRole)
-
-            msgbox.setDefaultButton(save_button)
-
-            reply = msgbox.exec_()
-
-            if msgbox.clickedButton() == save_button:
-                self.save_pdf(skip = True)
-                event.accept()
-            elif msgbox.clickedButton() == discard_button:
-                event.accept()
-            else:
-                event.ignore()
-
-    def assemble_pixmap(self, page, zoom, noScale = False):
+    def get_save_pools(self):
+        # With a single worker the pages are composed and written in this process, without starting any processes
+        workers = min(self.settings['saveWorkers'] or os.cpu_count() or 1, max(1, self.total_pages))
+        if workers == 1:
+            return None, None
+        if self.save_pool is None or self.save_pool.workers != workers:
+            self.shutdown_save_pool()
+            self.save_pool = RenderPool(workers)
+            self.save_writer_pool = RenderPool(1)
+        return self.save_pool, self.save_writer_pool
+
+    def shutdown_save_pool(self):
+        if self.save_job is not None:
+            self.save_job.cancel()
+        if self.save_pool is not None:
+            self.save_pool.shutdown()
+            self.save_writer_pool.shutdown()
+            self.save_pool = None
+            self.save_writer_pool = None
 
-        pdf_pixmap, signatures = page
+    def closeEvent(self, event):
+        self.wait_for_save()
+
+        # Ask for every document with unsaved changes, showing it
+        for index, document in enumerate(list(self.documents)):
+            if not document.isSaved:
+                self.tab_bar.setCurrentIndex(index)
+                if not self.ask_to_save():
+                    event.ignore()
+                    return
+        event.accept()
+
+    def ask_to_save(self):
+        # For the current document, False if the user cancels or saving failed
+        msgbox = QMessageBox()
+        msgbox.setIcon(QMessageBox.Question)
+        msgbox.setWindowTitle('Speichern?' if self.language == 'de' else 'Save?')
+        name = os.path.basename(self.pdf_path)
+        msgbox.setText(f'Es liegen ungespeicherte Änderungen in {name} vor!\nVor dem Schließen speichern?' if self.language == 'de' else f'There are unsaved changes in {name}!\nSave before closing?')
+        save_button = msgbox.addButton('Speichern'  if self.language == 'de' else 'Save', QMessageBox.YesRole)
+        discard_button = msgbox.addButton('Verwerfen'  if self.language == 'de' else 'Discard', QMessageBox.NoRole)
+        cancel_button = msgbox.addButton('Abbrechen'  if self.language == 'de' else 'Cancel', QMessageBox.RejectRole)
+
+        msgbox.setDefaultButton(save_button)
+
+        reply = msgbox.exec_()
+
+        if msgbox.clickedButton() == save_button:
+            self.save_pdf(skip = True)
+            self.wait_for_save()
+            return self.isSaved
+        return msgbox.clickedButton() == discard_button
+
+    def assemble_pixmap(self, page_number, zoom):
+        with tracer.span('assemble page', page=page_number, zoom=zoom):
+            return self.assemble_page_pixmap(page_number, zoom)
+
+    def assemble_page_pixmap(self, page_number, zoom):
+        page_size, signatures = self.pages[page_number]
         # Scale pixmap to fit the screen initially
-        if noScale == False:
-            self.pdf_scale_factor = min((self.scroll_area.width() - self.scroll_area.verticalScrollBar().width() - 2) / pdf_pixmap.width(),
-                        (self.scroll_area.height() - self.scroll_area.horizontalScrollBar().height() - 2) / pdf_pixmap.height())
-            scale_factor = self.pdf_scale_factor
-        else:
-            scale_factor = 1.0
-
-        pdf_pixmap = pdf_pixmap.scaled(int(pdf_pixmap.width() * scale_factor * zoom),
-                                    int(pdf_pixmap.height() * scale_factor * zoom),
-                                    aspectRatioMode=Qt.KeepAspectRatio,
-                                    transformMode=Qt.SmoothTransformation)
-
-        painter = QPainter(pdf_pixmap)
-        painter.setRenderHint(QPainter.Antialiasing)
-        for sig in signatures:
-            sig_idx = sig[0]
-            painter.drawPixmap(int(sig[2] * scale_factor * zoom),
-                                int(sig[3] * scale_factor * zoom),
-                                self.signatures[sig_idx][1].scaled(int(self.signatures[sig_idx][1].width() * self.signatures[sig_idx][3] * sig[1] * zoom * scale_factor),
-                                                            int(self.signatures[sig_idx][1].height() * self.signatures[sig_idx][3] * sig[1] * zoom * scale_factor),
-                                                            aspectRatioMode=Qt.KeepAspectRatio,
-                                                            transformMode=Qt.SmoothTransformation))
-        painter.end()
+        self.pdf_scale_factor = self.fit_scale_factor(page_size)
+        scale_factor = self.pdf_scale_factor
+
+        # Render from the vector source at the effective size (the fitted one is usually prefetched),
+        # copy it before painting on the cached pixmap
+        pdf_pixmap = self.get_page_pixmap(page_number, page_size * (scale_factor * zoom)).copy()
+
+        with tracer.span('draw signatures', signatures=len(signatures)):
+            painter = QPainter(pdf_pixmap)
+            painter.setRenderHint(QPainter.Antialiasing)
+            for sig in signatures:
+                painter.drawPixmap(int(sig[2] * scale_factor * zoom),
+                                    int(sig[3] * scale_factor * zoom),
+                                    self.scaled_signature(sig[0], sig[1] * zoom * scale_factor))
+            painter.end()
 
         return pdf_pixmap
 
-if __name__ == '__main__':
-    app = QApplication(sys.argv)
+    def scaled_signature(self, sig_idx, scale_factor):
+        signature_path, signature_size, _, signature_scale_factor = self.signatures[sig_idx]
+        scale_factor *= signature_scale_factor
+        return self.signature_cache.get(signature_path,
+                                        int(signature_size.width() * scale_factor),
+                                        int(signature_size.height() * scale_factor))
 
-    pdf_path = sys.argv[1] if len(sys.argv) > 1 else None
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='PDF Signer')
+    parser.add_argument('pdf', nargs='*', help='PDF to open, or the PDFs (or glob patterns) to sign with --batch')
+    parser.add_argument('--batch', metavar='PLACEMENTS', help='sign the PDFs without a window, using the placements from this JSON file')
+    parser.add_argument('--auto-place', metavar='SIGNATURE', type=int,
+                        help='sign the PDFs without a window, placing this signature at the signature fields and labels found in each of them')
+    parser.add_argument('--workers', type=int, default=0, help='processes for --batch and --watch (default: saveWorkers setting, 0 = all cores)')
+    parser.add_argument('--output-dir', help='directory for the signed PDFs of --batch (default: next to each PDF) and --watch')
+    parser.add_argument('--overwrite', action='store_true', help='replace existing signed PDFs in --batch and --watch mode')
+    parser.add_argument('--watch', metavar='INBOX',
+                        help='keep signing the PDFs put into this directory like --batch, until stopped; signed PDFs go to --output-dir '
+                             '(default INBOX/signed), the originals to INBOX/done')
+    parser.add_argument('--quarantine', metavar='DIR', help='directory for the PDFs --watch cannot sign (default INBOX/quarantine)')
+    parser.add_argument('--poll', metavar='SECONDS', type=float,
+                        help='let --watch list the inbox every SECONDS instead of using inotify, e.g. on network shares')
+    parser.add_argument('--serve', action='store_true',
+                        help='run a local signing service for --service, with the signatures of --batch (or the configured ones) loaded once')
+    parser.add_argument('--service', action='store_true', help='let the service started with --serve sign the PDFs of --batch or --auto-place')
+    parser.add_argument('--port', type=int, default=SERVICE_PORT, help=f'localhost port of --serve and --service (default {SERVICE_PORT})')
+    parser.add_argument('--clear-cache', action='store_true', help='delete the page images kept on disk and exit')
+    parser.add_argument('--trace', metavar='JSON', help='record where the time goes into this Chrome trace file and print a summary at the end '
+                                                        '(the same as setting PDFSIGNER_TRACE)')
+    arguments, qt_arguments = parser.parse_known_args()
+
+    if arguments.trace:
+        os.environ['PDFSIGNER_TRACE'] = tracer.path = os.path.abspath(arguments.trace)  # inherited by the worker processes
+
+    if arguments.clear_cache:
+        directory = cache_dir('pages')
+        freed = DiskRenderCache(directory, 0).clear()
+        print(f'{directory}: {freed / 1024 / 1024:.1f} MB freed')
+        sys.exit(0)
+
+    if arguments.serve:
+        status = serve(arguments)
+        tracer.finish()
+        sys.exit(status)
+
+    if arguments.service:
+        sys.exit(submit_to_service(arguments))
+
+    if arguments.watch:
+        status = watch_inbox(arguments)
+        tracer.finish()
+        sys.exit(status)
+
+    if arguments.batch or arguments.auto_place is not None:
+        status = batch_sign(arguments)
+        tracer.finish()
+        sys.exit(status)
+
+    app = QApplication(sys.argv[:1] + qt_arguments)
+
+    pdf_path = arguments.pdf[0] if arguments.pdf else None
     ex = PDFSigner(pdf_path)
+    app.aboutToQuit.connect(tracer.finish)  # after the window has stopped its worker processes
     sys.exit(app.exec_())
@@ -0,0 +1,144 @@
+import os
+import sys
+import time
+import tempfile
+import unittest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QImage, QColor
+import fitz
+
+import pdf_signer_v2 as signer
+
+def make_document(path, page_count):
+    doc = fitz.open()
+    for page_number in range(page_count):
+        page = doc.new_page()
+        for line in range(40):
+            page.insert_text((50, 60 + line * 18), f'{os.path.basename(path)} page {page_number + 1}, line {line + 1}', fontsize=9)
+    doc.save(path)
+    doc.close()
+
+def resident_bytes():
+    # Current, not peak, resident set size of this process
+    with open('/proc/self/statm', 'r') as file:
+        return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+class DocumentSessionTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Settings and caches of the window go to a directory of their own
+        cls.directory = tempfile.TemporaryDirectory()
+        os.environ['HOME'] = cls.directory.name
+        os.environ['XDG_CACHE_HOME'] = os.path.join(cls.directory.name, 'cache')
+        cls.app = QApplication.instance() or QApplication(sys.argv[:1])
+        cls.paths = [os.path.join(cls.directory.name, f'document{number}.pdf') for number in range(3)]
+        for path in cls.paths:
+            make_document(path, 30)
+        signature_path = os.path.join(cls.directory.name, 'signature.png')
+        signature = QImage(300, 100, QImage.Format_ARGB32)
+        signature.fill(QColor(0, 0, 120, 255))
+        signature.save(signature_path)
+        signatures_list_file = signer.config_file('signatures')
+        os.makedirs(os.path.dirname(signatures_list_file))
+        with open(signatures_list_file, 'w') as file:
+            file.write(signature_path + '\n')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.app.aboutToQuit.emit()  # stops the worker processes
+        cls.directory.cleanup()
+
+    def setUp(self):
+        self.window = signer.PDFSigner()
+        self.pump(lambda: not self.window.open_after_paint)
+
+    def tearDown(self):
+        for document in list(self.window.documents):
+            document.isSaved = True
+        self.window.close()
+        self.window.deleteLater()
+        self.pump(lambda: False, 0.1)
+
+    def pump(self, done, timeout=60):
+        deadline = time.monotonic() + timeout
+        while not done() and time.monotonic() < deadline:
+            self.app.processEvents()
+            time.sleep(0.005)
+        return done()
+
+    def open_all(self):
+        for path in self.paths:
+            self.window.open_pdf(path)
+        self.assertTrue(self.pump(lambda: all(document.total_pages and len(document.pages) == document.total_pages
+                                              and document.doc_index is not None for document in self.window.documents)))
+
+    def test_tabs_keep_their_pages_while_evicted(self):
+        self.open_all()
+        self.assertEqual([document.pdf_path for document in self.window.documents], self.paths)
+        first, second, third = self.window.documents
+        self.assertIs(self.window.document, third)
+
+        self.window.tab_bar.setCurrentIndex(0)
+        self.window.show_page(5)
+        self.window.pages[5][1].append((0, 1.0, 100, 100))
+        self.window.tab_bar.setCurrentIndex(1)
+        # Only the current tab keeps its MuPDF document
+        self.assertIsNone(first.doc)
+        self.assertIsNotNone(second.doc)
+        self.assertIsNone(third.doc)
+
+        self.window.tab_bar.setCurrentIndex(0)
+        self.assertEqual(self.window.current_page, 5)
+        self.assertEqual(self.window.pages[5][1], [(0, 1.0, 100, 100)])
+        self.assertEqual(self.window.doc.name, self.paths[0])
+        self.assertFalse(self.window.pdf_label.pixmap() is None or self.window.pdf_label.pixmap().isNull())
+
+        # Opening a file again only shows its tab
+        self.window.open_pdf(self.paths[1])
+        self.assertEqual(len(self.window.documents), 3)
+        self.assertIs(self.window.document, second)
+
+    def test_closing_tabs_releases_their_pages(self):
+        self.open_all()
+        for index in range(3):
+            self.window.tab_bar.setCurrentIndex(index)
+            self.window.next_page()
+        self.assertTrue(self.window.page_cache.pixmaps)
+        self.window.close_tab(1)
+        self.assertEqual([document.pdf_path for document in self.window.documents], [self.paths[0], self.paths[2]])
+        self.assertFalse(any(key[0] not in (self.window.documents[0].generation, self.window.documents[1].generation)
+                             for key in self.window.page_cache.pixmaps))
+        while self.window.documents:
+            self.window.close_tab(0)
+        self.assertEqual(self.window.page_cache.pixmaps, {})
+        self.assertIsNone(self.window.doc)
+        self.assertEqual(self.window.pages, [])
+        self.assertFalse(self.window.save_pdf_button.isEnabled())
+
+    @unittest.skipUnless(os.path.exists('/proc/self/statm'), 'needs /proc to read the resident set size')
+    def test_memory_stays_flat_when_opening_and_closing(self):
+        def cycle():
+            self.open_all()
+            for index in range(3):
+                self.window.tab_bar.setCurrentIndex(index)
+                self.window.show_page(10)
+                self.window.assemble_pixmap(10, 2)
+            while self.window.documents:
+                self.window.close_tab(0)
+            self.pump(lambda: not any(pool.futures for pool in (self.window.open_pool, self.window.render_pool,
+                                                                 self.window.index_pool, self.window.thumbnail_pool)))
+
+        for warm_up in range(3):
+            cycle()
+        before = resident_bytes()
+        for repetition in range(12):
+            cycle()
+        growth = resident_bytes() - before
+        self.assertLess(growth, 16 * 1024 * 1024, f'resident set grew by {growth / 1024 / 1024:.1f} MB over 12 cycles')
+
+if __name__ == '__main__':
+    unittest.main()
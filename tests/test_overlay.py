@@ -0,0 +1,68 @@
+import os
+import sys
+import tempfile
+import unittest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtGui import QImage, QColor
+import fitz
+
+import pdf_signer_v2 as signer
+
+def ink_box(path, page_number):
+    # Bounding box of the blue signature ink on the page rendered at RENDER_DPI
+    with fitz.open(path) as doc:
+        pixmap = doc[page_number].get_pixmap(dpi=signer.RENDER_DPI)
+    xs, ys = [], []
+    for y in range(0, pixmap.height, 2):
+        for x in range(0, pixmap.width, 2):
+            red, green, blue = pixmap.pixel(x, y)[:3]
+            if blue > 150 and red < 80:
+                xs.append(x)
+                ys.append(y)
+    return (min(xs), min(ys), max(xs), max(ys)) if xs else None
+
+class OverlayModeTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        signature_path = os.path.join(self.directory.name, 'signature.png')
+        signature = QImage(300, 100, QImage.Format_ARGB32)
+        signature.fill(QColor(0, 0, 0, 0))
+        for y in range(30, 70):
+            for x in range(20, 280):
+                signature.setPixelColor(x, y, QColor(0, 0, 200, 255))
+        signature.save(signature_path)
+        self.signatures = [(signature_path, signer.SIGNATURE_HEIGHT / signer.load_signature_image(signature_path).height())]
+        self.pdf_path = os.path.join(self.directory.name, 'form.pdf')
+        doc = fitz.open()
+        for rotation in (0, 90, 270):
+            page = doc.new_page()
+            page.insert_text((50, 60), f'rotated by {rotation}')
+            page.set_rotation(rotation)
+        doc.save(self.pdf_path)
+        doc.close()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def sign(self, mode):
+        settings = {key: info['value'] for key, info in signer.PDFSigner.load_settings_info().items()}
+        settings.update(saveMode=mode, saveGray=False, saveSkewed=False, skewSeed=1)
+        output_path = os.path.join(self.directory.name, f'{mode}.pdf')
+        signer.sign_document(self.pdf_path, output_path, [[(0, 2.0, 300, 400)]] * 3, self.signatures, signer.output_options(settings), 8)
+        return output_path
+
+    def test_signatures_where_the_raster_mode_puts_them(self):
+        raster_path, overlay_path = self.sign('raster'), self.sign('overlay')
+        for page_number in range(3):
+            self.assertEqual(ink_box(overlay_path, page_number), ink_box(raster_path, page_number))
+
+    def test_pages_stay_text_sharing_one_signature_image(self):
+        with fitz.open(self.sign('overlay')) as doc:
+            self.assertEqual([page.get_text().strip() for page in doc], ['rotated by 0', 'rotated by 90', 'rotated by 270'])
+            self.assertEqual(len({image[0] for page in doc for image in page.get_images()}), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import sys
+import json
+import time
+import socket
+import tempfile
+import subprocess
+import http.client
+import unittest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtGui import QImage, QColor
+import fitz
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pdf_signer_v2.py')
+
+def make_document(path, page_count):
+    doc = fitz.open()
+    for page_number in range(page_count):
+        doc.new_page().insert_text((50, 60), f'{os.path.basename(path)} page {page_number + 1}', fontsize=9)
+    doc.save(path)
+    doc.close()
+
+class SigningServiceTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        signature_path = os.path.join(cls.directory.name, 'signature.png')
+        signature = QImage(300, 100, QImage.Format_ARGB32)
+        signature.fill(QColor(0, 0, 120, 255))
+        signature.save(signature_path)
+        cls.placements = {'signatures': [signature_path], 'pages': [[[0, 1.0, 200, 1500]]]}
+        cls.placements_path = os.path.join(cls.directory.name, 'placements.json')
+        with open(cls.placements_path, 'w') as file:
+            json.dump(cls.placements, file)
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            cls.port = sock.getsockname()[1]
+        # Settings of its own, so the configured signatures and output settings of this machine are not used
+        cls.environment = dict(os.environ, HOME=cls.directory.name, XDG_CONFIG_HOME=os.path.join(cls.directory.name, 'config'),
+                               LANG='en_US.UTF-8')
+        cls.log = open(os.path.join(cls.directory.name, 'service.log'), 'w')
+        cls.server = subprocess.Popen([sys.executable, SCRIPT, '--serve', '--batch', cls.placements_path, '--workers', '2',
+                                       '--port', str(cls.port)], env=cls.environment, stdout=cls.log, stderr=cls.log)
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', cls.port)).close()
+                break
+            except ConnectionRefusedError:
+                if cls.server.poll() is not None or time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.terminate()
+        cls.server.wait(60)
+        cls.log.close()
+        cls.directory.cleanup()
+
+    def client(self, *arguments):
+        return subprocess.run([sys.executable, SCRIPT, '--service', '--port', str(self.port), *arguments], env=self.environment,
+                              stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, timeout=120)
+
+    def request(self, job, pdf_data):
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=120)
+        connection.request('POST', '/sign', json.dumps(job).encode() + b'\n' + pdf_data)
+        response = connection.getresponse()
+        body = response.read()
+        connection.close()
+        return response.status, body
+
+    def test_client_signs_through_the_service(self):
+        output_dir = os.path.join(self.directory.name, 'signed')
+        paths = [os.path.join(self.directory.name, f'form{number}.pdf') for number in range(5)]
+        for number, path in enumerate(paths):
+            make_document(path, number + 1)
+        broken_path = os.path.join(self.directory.name, 'broken.pdf')
+        with open(broken_path, 'wb') as file:
+            file.write(b'%PDF-1.7 not really a PDF\n')
+
+        result = self.client('--batch', self.placements_path, '--output-dir', output_dir, '--workers', '3', *paths, broken_path)
+        self.assertEqual(result.returncode, 1, result.stdout)  # the broken PDF
+        self.assertIn('5 of 6 documents, 15 pages', result.stdout)
+        self.assertIn('broken.pdf: Failed to open', result.stdout)
+        for number in range(5):
+            with fitz.open(os.path.join(output_dir, f'form{number}_signed.pdf')) as doc:
+                self.assertEqual(doc.page_count, number + 1)
+        self.assertEqual([name for name in os.listdir(output_dir) if name.startswith('.')], [])
+
+    def test_rejects_jobs_it_cannot_sign(self):
+        pdf_path = os.path.join(self.directory.name, 'single.pdf')
+        make_document(pdf_path, 1)
+        with open(pdf_path, 'rb') as file:
+            pdf_data = file.read()
+        status, body = self.request({'pages': self.placements['pages']}, pdf_data)
+        self.assertEqual(status, 200)
+        self.assertTrue(body.startswith(b'%PDF'))
+        status, body = self.request({'pages': [[[1, 1.0, 0, 0]]]}, pdf_data)
+        self.assertEqual((status, body), (422, b'signature index 1 out of range, 1 signatures known\n'))
+        status, body = self.request({'signatures': ['/elsewhere/signature.png']}, pdf_data)
+        self.assertEqual((status, body), (422, b'the service was started with other signatures\n'))
+
+    def test_client_without_service(self):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        pdf_path = os.path.join(self.directory.name, 'unsent.pdf')
+        make_document(pdf_path, 1)
+        result = subprocess.run([sys.executable, SCRIPT, '--service', '--port', str(port), '--auto-place', '0', pdf_path],
+                                env=self.environment, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, timeout=120)
+        self.assertEqual(result.returncode, 2)
+        self.assertIn(f'no signing service on port {port}', result.stdout)
+
+if __name__ == '__main__':
+    unittest.main()
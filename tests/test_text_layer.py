@@ -0,0 +1,64 @@
+import os
+import sys
+import tempfile
+import unittest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz
+
+import pdf_signer_v2 as signer
+
+class TextLayerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.pdf_path = os.path.join(self.directory.name, 'letter.pdf')
+        doc = fitz.open()
+        for rotation in (0, 90):
+            page = doc.new_page()
+            page.insert_text((72, 100), 'Sehr geehrte Frau Müller (Kundin),', fontsize=12, fontname='tiro')
+            page.insert_text((72, 700), 'Unterschrift', fontsize=24, fontname='cour')
+            page.set_rotation(rotation)
+        doc.save(self.pdf_path)
+        doc.close()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def sign(self, **settings_changes):
+        settings = {key: info['value'] for key, info in signer.PDFSigner.load_settings_info().items()}
+        settings.update(saveText=True, skewSeed=1, **settings_changes)
+        output_path = os.path.join(self.directory.name, 'signed.pdf')
+        signer.sign_document(self.pdf_path, output_path, [], [], signer.output_options(settings), 8)
+        return fitz.open(output_path)
+
+    def test_words_lie_where_they_were(self):
+        with fitz.open(self.pdf_path) as source, self.sign(saveSkewed=False, saveScanEffects=False) as output:
+            for source_page, output_page in zip(source, output):
+                # The output page is the source page as shown, rotated
+                expected = [(word[4], fitz.Rect(word[:4]) * source_page.rotation_matrix) for word in source_page.get_text('words')]
+                found = [(word[4], fitz.Rect(word[:4])) for word in output_page.get_text('words')]
+                self.assertEqual([text for text, _ in found], [text for text, _ in expected])
+                for (text, rect), (_, expected_rect) in zip(found, expected):
+                    # Lines start and end where they did, words in between move by the differences between the
+                    # glyph widths of Helvetica and the original font
+                    self.assertLess(max(abs(a - b) for a, b in zip(rect, expected_rect)), 5, text)
+
+    def test_skewed_text_stays_invisible_and_searchable(self):
+        for engine in ('numpy', 'qpainter'):
+            with self.sign(saveSkewed=True, saveScanEffects=True, scanEngine=engine) as output:
+                self.assertEqual(output[0].get_text().split(), 'Sehr geehrte Frau Müller (Kundin), Unterschrift'.split())
+                self.assertEqual(len(output[1].search_for('Unterschrift')), 1)
+                # Render mode 3: the page image looks the same without the text layer
+                self.assertIn(b'3 Tr', output.xref_stream(output[0].get_contents()[0]))
+
+    def test_off_by_default(self):
+        settings = {key: info['value'] for key, info in signer.PDFSigner.load_settings_info().items()}
+        output_path = os.path.join(self.directory.name, 'flat.pdf')
+        signer.sign_document(self.pdf_path, output_path, [], [], signer.output_options(settings), 8)
+        with fitz.open(output_path) as output:
+            self.assertEqual(output[0].get_text(), '')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import sys
+import json
+import time
+import signal
+import tempfile
+import subprocess
+import unittest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtGui import QImage, QColor
+import fitz
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pdf_signer_v2.py')
+
+def make_document(path, page_count):
+    doc = fitz.open()
+    for page_number in range(page_count):
+        doc.new_page().insert_text((50, 60), f'{os.path.basename(path)} page {page_number + 1}', fontsize=9)
+    doc.save(path)
+    doc.close()
+
+class WatchInboxTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.inbox = os.path.join(self.directory.name, 'inbox')
+        self.outbox = os.path.join(self.directory.name, 'outbox')
+        os.makedirs(self.inbox)
+        signature_path = os.path.join(self.directory.name, 'signature.png')
+        signature = QImage(300, 100, QImage.Format_ARGB32)
+        signature.fill(QColor(0, 0, 120, 255))
+        signature.save(signature_path)
+        self.placements_path = os.path.join(self.directory.name, 'placements.json')
+        with open(self.placements_path, 'w') as file:
+            json.dump({'signatures': [signature_path], 'pages': [[[0, 1.0, 200, 1500]]]}, file)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def drop(self, name, page_count=None):
+        # Written under a hidden name and renamed, like a sender should
+        temp_path = os.path.join(self.inbox, '.' + name)
+        if page_count is None:
+            with open(temp_path, 'wb') as file:
+                file.write(b'%PDF-1.7 not really a PDF\n')
+        else:
+            make_document(temp_path, page_count)
+        os.rename(temp_path, os.path.join(self.inbox, name))
+
+    def wait_for(self, *paths):
+        deadline = time.monotonic() + 90
+        while not all(os.path.exists(path) for path in paths):
+            self.assertIsNone(self.process.poll(), 'the daemon exited')
+            self.assertLess(time.monotonic(), deadline, f'not created: {[path for path in paths if not os.path.exists(path)]}')
+            time.sleep(0.2)
+
+    def run_daemon(self, *options):
+        # Settings of its own, so the configured signatures and output settings of this machine are not used
+        environment = dict(os.environ, HOME=self.directory.name, XDG_CONFIG_HOME=os.path.join(self.directory.name, 'config'),
+                           LANG='en_US.UTF-8')
+        self.process = subprocess.Popen([sys.executable, SCRIPT, '--watch', self.inbox, '--batch', self.placements_path,
+                                         '--output-dir', self.outbox, '--workers', '2', *options],
+                                        env=environment, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        self.addCleanup(self.process.kill)
+
+        self.drop('before.pdf', 3)  # there when it starts, or arriving before the watch is set up
+        self.drop('good.pdf', 2)
+        self.drop('broken.pdf')
+        with open(os.path.join(self.inbox, 'notes.txt'), 'w') as file:
+            file.write('not a PDF\n')
+        self.wait_for(os.path.join(self.outbox, 'before_signed.pdf'), os.path.join(self.outbox, 'good_signed.pdf'),
+                      os.path.join(self.inbox, 'done', 'good.pdf'), os.path.join(self.inbox, 'quarantine', 'broken.pdf'))
+
+        # The same name again is signed again, without replacing the first result
+        self.drop('good.pdf', 4)
+        self.wait_for(os.path.join(self.outbox, 'good_signed1.pdf'), os.path.join(self.inbox, 'done', 'good_1.pdf'))
+
+        self.process.send_signal(signal.SIGTERM)
+        output = self.process.communicate(timeout=60)[0]
+        self.assertEqual(self.process.returncode, 0, output)
+
+        self.assertEqual(sorted(os.listdir(self.inbox)), ['done', 'notes.txt', 'quarantine'])
+        self.assertEqual(sorted(os.listdir(self.outbox)), ['before_signed.pdf', 'good_signed.pdf', 'good_signed1.pdf'])
+        for name, page_count in (('before_signed.pdf', 3), ('good_signed.pdf', 2), ('good_signed1.pdf', 4)):
+            with fitz.open(os.path.join(self.outbox, name)) as doc:
+                self.assertEqual(doc.page_count, page_count)
+        self.assertTrue(os.path.exists(os.path.join(self.inbox, 'quarantine', 'broken.pdf.txt')))
+        self.assertIn('3 documents, 9 pages', output)
+
+    def test_inotify(self):
+        self.run_daemon()
+
+    def test_polling(self):
+        self.run_daemon('--poll', '0.3')
+
+if __name__ == '__main__':
+    unittest.main()